@@ -0,0 +1,81 @@
+"""Compares memory that forked DataLoader workers copy from a regular and a compact `BaseDataset`.
+
+Every worker reads all the samples once, like over an epoch. The memory that becomes private to
+the worker afterwards (pages duplicated by copy-on-write) is reported. Linux only.
+
+Usage:
+    python benchmarks/bench_dataset_memory.py [--files N] [--workers N]
+"""
+
+import argparse
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from pyedpiper.data import BaseDataset
+
+
+class SampleDataset(BaseDataset):
+
+    def __getitem__(self, idx):
+        return self.samples[idx]
+
+
+_dataset = None
+
+
+def private_bytes() -> int:
+    total = 0
+    with open('/proc/self/smaps_rollup') as file:
+        for line in file:
+            if line.startswith(('Private_Clean:', 'Private_Dirty:')):
+                total += int(line.split()[1]) * 1024
+    return total
+
+
+def worker(_) -> int:
+    before = private_bytes()
+    for idx in range(len(_dataset)):
+        _dataset[idx]
+    return private_bytes() - before
+
+
+def measure(root: Path, labels: pd.DataFrame, workers: int, compact: bool):
+    global _dataset
+
+    start = time.perf_counter()
+    _dataset = SampleDataset(root, labels, 'label', 'id', ('jpg',), loader=None, compact=compact)
+    seconds = time.perf_counter() - start
+
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        copied = pool.map(worker, range(workers))
+
+    _dataset = None
+    return seconds, sum(copied)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=200_000)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        names = [f"{idx:08d}" for idx in range(args.files)]
+        for name in names:
+            (root / f"{name}.jpg").touch()
+
+        labels = pd.DataFrame({'id': names, 'label': [idx % 1000 for idx in range(args.files)]})
+
+        for compact in (False, True):
+            seconds, copied = measure(root, labels, args.workers, compact)
+            name = "compact" if compact else "lists"
+            print(f"{name:<8} build {seconds:6.2f} s, copied by {args.workers} workers {copied / 2 ** 20:8.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Compares decode throughput of the image decoders against the former `plt_loader` path.
+
+`plt_loader` is timed together with the float to uint8 conversion `ImageDataset` used to do for it.
+
+Usage:
+    python benchmarks/bench_decode.py [--images N] [--size PX]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from pyedpiper.data.utils import available_decoders, get_decoder, plt_loader
+
+
+def plt_uint8(path):
+    image = plt_loader(path)
+    if image.dtype == np.float32:
+        image *= 255
+        image = image.clip(0, 255).astype(np.uint8)
+    return image
+
+
+def throughput(decoder, paths, repeats) -> float:
+    for path in paths:
+        decoder(path)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for path in paths:
+            decoder(path)
+    return repeats * len(paths) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', type=int, default=50)
+    parser.add_argument('--size', type=int, default=512)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    candidates = {"plt_loader": plt_uint8}
+    for name in available_decoders():
+        candidates[name] = get_decoder(name)
+    for name in set(available_decoders()).intersection(('pil', 'opencv')):
+        candidates[f"{name}, reduce=2"] = get_decoder(name, reduce=2)
+
+    random = np.random.RandomState(0)
+    with tempfile.TemporaryDirectory() as directory:
+        for extension in ('jpg', 'png'):
+            paths = list()
+            for idx in range(args.images):
+                # Smooth images compress like photos do, unlike noise
+                gradient = np.linspace(0, 255, args.size, dtype=np.float32)
+                image = (gradient[:, None, None] + gradient[None, :, None] * random.rand(3)) / 2
+                path = Path(directory) / f"{idx}.{extension}"
+                Image.fromarray(image.astype(np.uint8)).save(path)
+                paths.append(path)
+
+            for name, decoder in candidates.items():
+                rate = throughput(decoder, paths, args.repeats)
+                print(f"{extension} {name:<18} {rate:8.1f} images/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Compares focal loss implementations by time and memory of a forward-backward step.
+
+Modes:
+    multiclass: vectorized `FocalLoss` against the former loop over the classes
+    binary: fused `focal_loss_with_logits` against the same loss built of separate autograd ops
+
+Reports activations saved for backward, and on CUDA the peak allocated memory,
+on CPU the total memory allocated during the step.
+
+Usage:
+    python benchmarks/bench_focal_loss.py [--mode multiclass|binary] [--device cpu|cuda]
+"""
+
+import argparse
+import timeit
+
+import torch
+import torch.nn.functional as F
+from torch.profiler import ProfilerActivity, profile
+
+from pyedpiper.modules.loss import FocalLoss, focal_loss_with_logits
+
+
+def focal_loss_per_class(input, target, ignore_index=None, **kwargs):
+    loss = 0
+    not_ignored = target != ignore_index
+
+    for cls in range(input.size(1)):
+        cls_target = (target == cls).long()
+        cls_input = input[:, cls, ...]
+
+        if ignore_index is not None:
+            cls_target = cls_target[not_ignored]
+            cls_input = cls_input[not_ignored]
+
+        loss += focal_loss_with_logits(cls_input, cls_target, alpha=None, **kwargs)
+
+    return loss
+
+
+def focal_loss_composite(input, target, gamma=2.0, alpha=0.25, reduced_threshold=0.5):
+    target = target.type_as(input)
+    logpt = F.binary_cross_entropy_with_logits(input, target, reduction="none")
+    pt = torch.exp(-logpt)
+
+    focal_term = ((1.0 - pt) / reduced_threshold).pow(gamma)
+    focal_term = torch.where(pt < reduced_threshold, torch.ones_like(focal_term), focal_term)
+
+    loss = focal_term * logpt
+    loss = loss * (alpha * target + (1 - alpha) * (1 - target))
+    loss = loss / (focal_term.sum() + 1e-5)
+    return loss.sum()
+
+
+def step(fn, input, target, device):
+    input.grad = None
+    fn(input, target).backward()
+    if device == 'cuda':
+        torch.cuda.synchronize()
+
+
+def saved_memory(fn, input, target) -> int:
+    """Bytes of activations kept for backward, i. e. held between forward and backward passes."""
+
+    saved = dict()
+
+    def pack(tensor):
+        saved[tensor.data_ptr()] = tensor.numel() * tensor.element_size()
+        return tensor
+
+    with torch.autograd.graph.saved_tensors_hooks(pack, lambda tensor: tensor):
+        fn(input, target)
+
+    # Inputs are kept anyway
+    saved.pop(input.data_ptr(), None)
+    saved.pop(target.data_ptr(), None)
+    return sum(saved.values())
+
+
+def memory(fn, input, target, device) -> int:
+    if device == 'cuda':
+        torch.cuda.reset_peak_memory_stats()
+        baseline = torch.cuda.memory_allocated()
+        step(fn, input, target, device)
+        return torch.cuda.max_memory_allocated() - baseline
+
+    with profile(activities=[ProfilerActivity.CPU], profile_memory=True) as prof:
+        step(fn, input, target, device)
+    return sum(max(event.self_cpu_memory_usage, 0) for event in prof.key_averages())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=['multiclass', 'binary'], default='multiclass')
+    parser.add_argument('--batch', type=int, default=256)
+    parser.add_argument('--classes', type=int, default=1000)
+    parser.add_argument('--anchors', type=int, default=500_000)
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--device', default='cpu')
+    args = parser.parse_args()
+
+    if args.mode == 'multiclass':
+        input = torch.randn(args.batch, args.classes, device=args.device, requires_grad=True)
+        target = torch.randint(-1, args.classes, (args.batch,), device=args.device)
+        candidates = {
+            "per class loop": lambda x, y: focal_loss_per_class(x, y, ignore_index=-1),
+            "vectorized": FocalLoss(ignore_index=-1),
+        }
+    else:
+        input = torch.randn(args.batch, args.anchors // args.batch, device=args.device, requires_grad=True)
+        target = torch.randint(0, 2, input.shape, device=args.device)
+        options = dict(alpha=0.25, reduced_threshold=0.5)
+        candidates = {
+            "composite": lambda x, y: focal_loss_composite(x, y, **options),
+            "fused": lambda x, y: focal_loss_with_logits(x, y, reduction="sum", normalized=True, **options),
+        }
+
+    for name, fn in candidates.items():
+        step(fn, input, target, args.device)
+        seconds = timeit.timeit(lambda: step(fn, input, target, args.device), number=args.repeats) / args.repeats
+        saved = saved_memory(fn, input, target) / 2 ** 20
+        allocated = memory(fn, input, target, args.device) / 2 ** 20
+        print(f"{name:<16} {seconds * 1e3:8.2f} ms {saved:10.1f} MB saved {allocated:10.1f} MB allocated")
+
+
+if __name__ == '__main__':
+    main()
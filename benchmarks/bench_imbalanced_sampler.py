@@ -0,0 +1,79 @@
+"""Compares construction and draw time of `ImbalancedDatasetSampler` against the former per-index implementation.
+
+Usage:
+    python benchmarks/bench_imbalanced_sampler.py [--samples N] [--classes K]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import torch
+
+from pyedpiper.data import ImbalancedDatasetSampler
+
+
+class TargetsDataset(torch.utils.data.Dataset):
+
+    def __init__(self, targets):
+        self.targets = targets
+
+    def __len__(self):
+        return len(self.targets)
+
+    def __getitem__(self, idx):
+        return self.targets[idx]
+
+
+class LoopSampler(torch.utils.data.sampler.Sampler):
+    """Former implementation: two Python passes over the labels and `torch.multinomial` draws."""
+
+    def __init__(self, dataset):
+        super().__init__()
+        self.indices = list(range(len(dataset)))
+        self.num_samples = len(self.indices)
+
+        label_to_count = {}
+        for idx in self.indices:
+            label = dataset[idx]
+            label_to_count[label] = label_to_count.get(label, 0) + 1
+
+        weights = [1.0 / label_to_count[dataset[idx]] for idx in self.indices]
+        self.weights = torch.DoubleTensor(weights)
+
+    def __iter__(self):
+        return (self.indices[i] for i in torch.multinomial(self.weights, self.num_samples, replacement=True))
+
+
+def measure(build):
+    start = time.perf_counter()
+    sampler = build()
+    built = time.perf_counter()
+    for _ in sampler:
+        pass
+    return built - start, time.perf_counter() - built
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--samples', type=int, default=1_000_000)
+    parser.add_argument('--classes', type=int, default=1000)
+    args = parser.parse_args()
+
+    # Zipf-like imbalance
+    probs = 1 / np.arange(1, args.classes + 1)
+    targets = np.random.RandomState(0).choice(args.classes, size=args.samples, p=probs / probs.sum())
+    dataset = TargetsDataset(targets)
+
+    candidates = {
+        "loop, multinomial": lambda: LoopSampler(dataset),
+        "vectorized, uniform": lambda: ImbalancedDatasetSampler(dataset),
+    }
+
+    for name, build in candidates.items():
+        build_seconds, draw_seconds = measure(build)
+        print(f"{name:<19} build {build_seconds:7.2f} s, draw an epoch {draw_seconds:7.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Measures the time it takes to import pyedpiper and get to `instantiate()`.
+
+Every measurement runs in a fresh interpreter, so nothing is cached in `sys.modules`.
+
+Usage:
+    python benchmarks/bench_import.py [--repeats N] [--budget SECONDS]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATEMENTS = {
+    "python": "pass",
+    "pyedpiper": "import pyedpiper",
+    "instantiate": "from pyedpiper import instantiate",
+    "get_random_name": "from pyedpiper.misc import get_random_name",
+    "modules": "import pyedpiper.modules; pyedpiper.modules.FocalLoss",
+}
+
+
+def measure(statement: str, repeats: int) -> float:
+    timings = list()
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, "-c", statement], cwd=PACKAGE_ROOT)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=0.5,
+                        help="Max seconds `from pyedpiper import instantiate` may take")
+    args = parser.parse_args()
+
+    results = {name: measure(statement, args.repeats) for name, statement in STATEMENTS.items()}
+    for name, seconds in results.items():
+        print(f"{name:<16} {seconds * 1e3:8.1f} ms")
+
+    if results["instantiate"] > args.budget:
+        print(f"Import budget of {args.budget * 1e3:.0f} ms is exceeded!")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
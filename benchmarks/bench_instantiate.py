@@ -0,0 +1,57 @@
+"""Compares repeated `instantiate()` calls against building a compiled config.
+
+Usage, from the repository root:
+    python -m benchmarks.bench_instantiate [--repeats N]
+"""
+
+import argparse
+import timeit
+
+from pyedpiper import compile, instantiate
+
+
+class Leaf:
+
+    def __init__(self, size: int, name: str = 'leaf', scale: float = 1.0):
+        self.size = size
+        self.name = name
+        self.scale = scale
+
+
+class Branch:
+
+    def __init__(self, left: Leaf, right: Leaf, depth: int = 0):
+        self.left = left
+        self.right = right
+        self.depth = depth
+
+
+def _node(target: type, **params):
+    return {'target': target.__name__, 'module': __name__, 'params': params}
+
+
+def make_config(depth: int = 4):
+    if not depth:
+        return _node(Leaf, size=depth, name='leaf')
+    return _node(Branch, left=make_config(depth - 1), right=make_config(depth - 1), depth=depth)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeats', type=int, default=200)
+    args = parser.parse_args()
+
+    config = make_config()
+    compiled = compile(config)
+
+    eager = timeit.timeit(lambda: instantiate(config, depth=1), number=args.repeats)
+    built = timeit.timeit(lambda: compiled.build(depth=1), number=args.repeats)
+
+    print(f"nodes per config:       {len(compiled)}")
+    print(f"instantiate():          {eager / args.repeats * 1e3:8.3f} ms")
+    print(f"CompiledConfig.build(): {built / args.repeats * 1e3:8.3f} ms")
+    print(f"speedup:                {eager / built:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
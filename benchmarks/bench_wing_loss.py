@@ -0,0 +1,76 @@
+"""Compares `wing_loss` implementations by time and memory of a forward-backward step.
+
+On CUDA the peak allocated memory is reported, on CPU the total memory allocated during the step.
+
+Usage:
+    python benchmarks/bench_wing_loss.py [--points N] [--device cpu|cuda]
+"""
+
+import argparse
+import math
+import timeit
+
+import torch
+from torch.profiler import ProfilerActivity, profile
+
+from pyedpiper.modules.loss import WingLoss
+
+
+def wing_loss_masked(input, target, width=5, curvature=0.5):
+    """Former implementation with boolean mask assignments."""
+
+    diff_abs = (target - input).abs()
+    loss = diff_abs.clone()
+
+    idx_smaller = diff_abs < width
+    idx_bigger = diff_abs >= width
+
+    loss[idx_smaller] = width * torch.log(1 + diff_abs[idx_smaller] / curvature)
+    loss[idx_bigger] = loss[idx_bigger] - (width - width * math.log(1 + width / curvature))
+    return loss.mean()
+
+
+def step(fn, input, target, device):
+    input.grad = None
+    fn(input, target).backward()
+    if device == 'cuda':
+        torch.cuda.synchronize()
+
+
+def memory(fn, input, target, device) -> int:
+    if device == 'cuda':
+        torch.cuda.reset_peak_memory_stats()
+        baseline = torch.cuda.memory_allocated()
+        step(fn, input, target, device)
+        return torch.cuda.max_memory_allocated() - baseline
+
+    with profile(activities=[ProfilerActivity.CPU], profile_memory=True) as prof:
+        step(fn, input, target, device)
+    return sum(max(event.self_cpu_memory_usage, 0) for event in prof.key_averages())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--points', type=int, default=2_000_000)
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--device', default='cpu')
+    args = parser.parse_args()
+
+    input = (torch.randn(args.points, 2, device=args.device) * 10).requires_grad_()
+    target = torch.randn(args.points, 2, device=args.device)
+
+    candidates = {
+        "masked": wing_loss_masked,
+        "where": WingLoss(),
+        "where, scripted": WingLoss(scripted=True),
+    }
+
+    for name, fn in candidates.items():
+        step(fn, input, target, args.device)
+        seconds = timeit.timeit(lambda: step(fn, input, target, args.device), number=args.repeats) / args.repeats
+        megabytes = memory(fn, input, target, args.device) / 2 ** 20
+        print(f"{name:<16} {seconds * 1e3:8.2f} ms {megabytes:10.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,42 @@
-from . import data
-from . import misc
-from . import modules
-from . import optim
-from .core import common as common
-from .core.common import *
+from .core.lazy import attach
+
+__getattr__, __dir__ = attach(
+    __name__,
+    submodules=[
+        "data",
+        "misc",
+        "modules",
+        "optim",
+    ],
+    attributes={
+        "as_numpy": ".core.common",
+        "as_tensor": ".core.common",
+        "call": ".core.common",
+        "common": ".core",
+        "compile": ".core.common",
+        "CompiledConfig": ".core.common",
+        "instantiate": ".core.common",
+        "LazyObject": ".core.common",
+        "parallel_instantiate": ".core.common",
+        "set_random_seed": ".core.common",
+        "transfer_weights": ".core.common",
+    },
+)
 
 __all__ = [
     "as_numpy",
     "as_tensor",
     "call",
     "common",
+    "compile",
+    "CompiledConfig",
     "data",
     "instantiate",
+    "LazyObject",
     "misc",
     "modules",
     "optim",
+    "parallel_instantiate",
     "set_random_seed",
     "transfer_weights",
     "__version__",
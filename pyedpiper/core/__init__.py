@@ -1,7 +1,12 @@
+from . import lazy
 from . import module_loader
 from . import object_caller
 
+__getattr__, __dir__ = lazy.attach(__name__, submodules=["common"])
+
 __all__ = [
+    "common",
+    "lazy",
     "module_loader",
     "object_caller",
 ]
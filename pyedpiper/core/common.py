@@ -1,36 +1,56 @@
+import inspect
 import logging
 import os
 import random
+import threading
 
-from collections import OrderedDict
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Executor, wait
+from functools import partial
 from numbers import Number
 from typing import (
+    TYPE_CHECKING,
     Any,
+    Callable,
     Iterable,
     List,
     Mapping,
     Optional,
     Tuple,
+    Union,
 )
 
-import numpy as np
-import torch
-from torch.nn import Module
-
 from .module_loader import ModuleLoader
-from .object_caller import ObjectCaller
+from .object_caller import CallPlan, ObjectCaller
+
+if TYPE_CHECKING:
+    import numpy as np
+    import torch
+    from torch.nn import Module
 
 log = logging.getLogger(__name__)
 
 _TARGET_KEY = "target"
 _MODULE_KEY = "module"
 _PARAMS_KEY = "params"
+# Keys only meaningful to the builder, never passed to the objects.
+# They're namespaced, so that they never clash with parameters of the objects
+_ID_KEY = "_id_"
+_REF_KEY = "_ref_"
+_SHARED_KEY = "_shared_"
+_LAZY_KEY = "_lazy_"
+
+_SERVICE_KEYS = (_ID_KEY, _REF_KEY, _SHARED_KEY, _LAZY_KEY)
 
 __all__ = [
     "as_numpy",
     "as_tensor",
     "call",
+    "compile",
+    "CompiledConfig",
     "instantiate",
+    "LazyObject",
+    "parallel_instantiate",
     "transfer_weights",
     "set_random_seed",
 ]
@@ -104,50 +124,525 @@ def _resolve_target_module(class_config: Mapping) -> Tuple[Any, Any]:
     return cls, source
 
 
+def _buildable(o: Any):
+    """Returns a resolved target if the object is a config node, `None` otherwise."""
+
+    if isinstance(o, Mapping):
+        try:
+            return _resolve_target(o)
+        except ValueError:
+            return None
+
+
+def _is_reference(o: Any) -> bool:
+    return isinstance(o, Mapping) and _REF_KEY in o and o.get(_TARGET_KEY) is None
+
+
+_PLAIN_TYPES = (str, bytes, int, float, complex, bool, type(None))
+
+
+def _freeze(o: Any) -> Any:
+    """Makes a hashable structural key out of a config node.
+
+    Plain values are compared by type and value, so that e.g. `1` and `True` differ.
+    Any other objects, e.g. arrays or tensors, are compared by identity.
+    """
+
+    if isinstance(o, Mapping):
+        return Mapping, frozenset((_freeze(key), _freeze(value)) for key, value in o.items())
+    if isinstance(o, (list, tuple)):
+        return type(o), tuple(_freeze(value) for value in o)
+    if type(o) in _PLAIN_TYPES:
+        return type(o), o
+
+    return type(o), id(o)
+
+
+def _collect_definitions(node: Mapping, definitions: dict):
+    """Finds all the config nodes marked with an id."""
+
+    if not isinstance(node, Mapping) or node.get(_TARGET_KEY) is None:
+        return
+
+    node_id = node.get(_ID_KEY)
+    if node_id is not None:
+        if node_id in definitions and definitions[node_id] != node:
+            error = f"Different config nodes share the same {_ID_KEY} '{node_id}'."
+            log.error(error)
+            raise ValueError(error)
+        definitions[node_id] = node
+
+    for value in _get_params(node).values():
+        _collect_definitions(value, definitions)
+
+
+def _count_ids(node: Mapping, counts: Counter):
+    """Counts the definitions and references of every id."""
+
+    if _is_reference(node):
+        counts[node[_REF_KEY]] += 1
+        return
+
+    if not isinstance(node, Mapping) or node.get(_TARGET_KEY) is None:
+        return
+
+    if node.get(_ID_KEY) is not None:
+        counts[node[_ID_KEY]] += 1
+
+    for value in _get_params(node).values():
+        _count_ids(value, counts)
+
+
 def instantiate(target_config: Mapping, **kwargs) -> Any:
-    """Same as `call()`, but allows recursive object instantiation."""
+    """Same as `call()`, but allows recursive object instantiation.
 
-    import inspect
+    Config nodes marked with an `_id_` are built only once and can be reused elsewhere in the config
+    with `{"_ref_": <id>}` params. Nodes marked as `_shared_` are built once per identical config.
+    Nodes marked as `_lazy_` are replaced with a `LazyObject` that builds them on the first use.
+    """
 
-    def buildable(o: Any):
-        if isinstance(o, Mapping):
-            try:
-                return _resolve_target(o)
-            except ValueError:
-                return None
+    return compile(target_config).build(**kwargs)
+
+
+class _CompiledNode:
+    """Single object of a compiled config with its parameters laid out in advance."""
+
+    __slots__ = ('obj', 'name', 'plan', 'defaults', 'children')
+
+    def __init__(self, obj: Any, plan: Optional[CallPlan], defaults: dict, children: Tuple):
+        self.obj = obj
+        self.name = getattr(obj, '__name__', repr(obj))
+        self.plan = plan
+        self.defaults = defaults
+        self.children = children
 
-    def postorder_from(node: Mapping):
-        obj = buildable(node)
+    def accepts(self, name: str) -> bool:
+        return self.plan is None or name in self.plan.parameters
 
-        if obj:
-            result = dict()
-            params = _get_params(node)
-            for param, value in params.items():
-                result[param] = postorder_from(value)
+    def check(self, provided: Iterable[str]):
+        if self.plan is None:
+            return
 
-            # If there is a method or a function provided as parameter
-            if inspect.isfunction(obj):
+        try:
+            self.plan.check(provided)
+        except Exception as e:
+            log.error("Can't call `{}`: {}".format(self.name, e))
+            raise e
+
+    def gather(self, results: Union[List, Mapping]) -> dict:
+        """Picks the results of own children only, e. g. to send them to another process."""
+        return {index: results[index] for _, index in self.children}
+
+    def build(self, results: Union[List, Mapping], overrides: Optional[Mapping] = None, check: bool = False) -> Any:
+        # If there is a method or a function provided as parameter
+        if inspect.isfunction(self.obj):
+            return self.obj
+
+        kwargs = self.defaults.copy()
+        for param, index in self.children:
+            kwargs[param] = results[index]
+
+        if overrides:
+            for param, value in overrides.items():
+                if self.accepts(param):
+                    kwargs[param] = instantiate(value) if _buildable(value) else value
+
+        if check:
+            self.check(kwargs)
+
+        try:
+            return self.obj(**kwargs)
+        except Exception as e:
+            log.error("Can't call `{}`: {}".format(self.name, e))
+            raise e
+
+
+class LazyObject:
+    """Proxy that builds the wrapped object on the first attribute access or call.
+
+    Note that type checks like `isinstance()` see the proxy itself, not the wrapped object.
+    """
+
+    __slots__ = ('_factory', '_object', '_lock')
+
+    def __init__(self, factory: Callable[[], Any]):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    @property
+    def __wrapped__(self) -> Any:
+        try:
+            return object.__getattribute__(self, '_object')
+        except AttributeError:
+            pass
+
+        with object.__getattribute__(self, '_lock'):
+            try:
+                return object.__getattribute__(self, '_object')
+            except AttributeError:
+                obj = object.__getattribute__(self, '_factory')()
+                object.__setattr__(self, '_object', obj)
                 return obj
 
-            result = _merge(node, result)
-            return ObjectCaller.call_from_kwargs(obj, **result)
+    def __getattr__(self, name):
+        return getattr(self.__wrapped__, name)
 
-        return node
+    def __setattr__(self, name, value):
+        setattr(self.__wrapped__, name, value)
 
-    # Convert to dict if needed
-    target_config = _to_dict(target_config)
+    def __delattr__(self, name):
+        delattr(self.__wrapped__, name)
+
+    def __dir__(self):
+        return dir(self.__wrapped__)
+
+    def __call__(self, *args, **kwargs):
+        return self.__wrapped__(*args, **kwargs)
+
+    def __len__(self):
+        return len(self.__wrapped__)
 
-    # Make sure we can resolve the root first
-    _resolve_target(target_config)
+    def __iter__(self):
+        return iter(self.__wrapped__)
 
-    # If params are None, set an empty dict as well
-    target_config[_PARAMS_KEY] = _get_params(target_config)
+    def __contains__(self, item):
+        return item in self.__wrapped__
 
-    if kwargs:
-        # Inject kwargs into params
-        target_config[_PARAMS_KEY].update(kwargs)
+    def __getitem__(self, key):
+        return self.__wrapped__[key]
 
-    return postorder_from(target_config)
+    def __setitem__(self, key, value):
+        self.__wrapped__[key] = value
+
+    def __bool__(self):
+        return bool(self.__wrapped__)
+
+    def __str__(self):
+        return str(self.__wrapped__)
+
+    def __repr__(self):
+        try:
+            obj = object.__getattribute__(self, '_object')
+        except AttributeError:
+            return f"<{type(self).__name__} of {object.__getattribute__(self, '_factory')!r}>"
+        return repr(obj)
+
+    def __reduce__(self):
+        # Locks can't be pickled, so the proxy is restored unbuilt
+        return type(self), (object.__getattribute__(self, '_factory'),)
+
+
+class _LazyNode:
+    """Compiled config node that is built only when its result is used.
+
+    Its children are the nodes of the enclosing config referenced from within the lazy one.
+    """
+
+    __slots__ = ('config', 'name', 'children')
+
+    def __init__(self, config: "CompiledConfig"):
+        self.config = config
+        self.name = config._nodes[-1].name
+        self.children = tuple((None, node.index) for node in config._nodes if isinstance(node, _ExternalNode))
+
+    def check(self, provided: Iterable[str]):
+        pass
+
+    def gather(self, results: Union[List, Mapping]) -> dict:
+        return {index: results[index] for _, index in self.children}
+
+    def build(self, results: Union[List, Mapping], overrides: Optional[Mapping] = None, check: bool = False) -> Any:
+        return LazyObject(partial(self.config._build, dict(), self.gather(results)))
+
+
+class _ExternalNode:
+    """Node of a lazy config standing for a node of the enclosing config, which is built by the latter."""
+
+    __slots__ = ('index', 'name', 'children')
+
+    def __init__(self, index: int, name: str):
+        self.index = index
+        self.name = name
+        self.children = ()
+
+    def build(self, outer: Union[List, Mapping]) -> Any:
+        return outer[self.index]
+
+
+class CompiledConfig:
+    """Reusable builder of a config, see `compile()`.
+
+    Targets are resolved and the config is flattened into a post-order list of nodes once,
+    so building the objects again only costs merging the precomputed parameters.
+    Nodes shared through ids, references or the `_shared_` flag are compiled into a single node
+    used by all of its parents, which makes the list a topologically sorted DAG rather than a tree.
+    Lazy nodes are compiled into configs of their own, so `_shared_` nodes aren't merged across their boundaries.
+    Ids are global though: nodes with ids also used outside of a lazy node are built eagerly by the enclosing config
+    and the lazy node gets the same instance as the rest of the config.
+    """
+
+    def __init__(self,
+                 target_config: Mapping,
+                 definitions: Optional[Mapping] = None,
+                 strict: bool = False,
+                 outer: Optional["CompiledConfig"] = None):
+        # Convert to dict if needed
+        target_config = _to_dict(target_config)
+
+        # Make sure we can resolve the root first
+        root = _resolve_target(target_config)
+
+        if definitions is None:
+            definitions = dict()
+            _collect_definitions(target_config, definitions)
+
+        self._definitions = definitions
+        self._strict = strict
+
+        # Lazy configs resolve the ids also used outside of them in the enclosing config
+        self._outer = outer
+        self._counts = Counter()
+        _count_ids(target_config, self._counts)
+        if outer is not None:
+            self._local = set(node_id for node_id, count in self._counts.items() if count == outer._counts[node_id])
+            self._counts = outer._counts
+        self._lazy = bool(target_config.get(_LAZY_KEY))
+
+        self._nodes = list()
+        self._ids = dict()
+        self._shared = dict()
+        self._compiling = set()
+        self._compile(target_config, root, is_root=True)
+
+        # Shared nodes may have several parents
+        self._parents = [set() for _ in self._nodes]
+        for index, node in enumerate(self._nodes):
+            for _, child in node.children:
+                self._parents[child].add(index)
+
+    def _compile_reference(self, node_id: Any) -> int:
+        if node_id in self._ids:
+            return self._ids[node_id]
+
+        if self._outer is not None and node_id not in self._local:
+            return self._compile_external(node_id)
+
+        if node_id not in self._definitions:
+            error = f"Can't find a config node with {_ID_KEY} '{node_id}' to reference."
+            log.error(error)
+            raise ValueError(error)
+
+        node = self._definitions[node_id]
+        return self._compile(node, _resolve_target(node))
+
+    def _compile_external(self, node_id: Any) -> int:
+        index = self._outer._compile_reference(node_id)
+        return self._register(_ExternalNode(index, self._outer._nodes[index].name), node_id, None)
+
+    def _compile(self, node: Mapping, obj: Any, is_root: bool = False) -> int:
+        node_id = node.get(_ID_KEY)
+        if node_id is not None and node_id in self._ids:
+            return self._ids[node_id]
+
+        if node_id is not None and not is_root and self._outer is not None and node_id not in self._local:
+            return self._compile_external(node_id)
+
+        key = _freeze(node) if node.get(_SHARED_KEY) else None
+        if key is not None and key in self._shared:
+            return self._shared[key]
+
+        if node_id is not None:
+            if node_id in self._compiling:
+                error = f"Config node with {_ID_KEY} '{node_id}' references itself."
+                log.error(error)
+                raise ValueError(error)
+
+            self._compiling.add(node_id)
+
+        if node.get(_LAZY_KEY) and not is_root:
+            config = {key: value for key, value in node.items() if key != _LAZY_KEY}
+            compiled = _LazyNode(CompiledConfig(config, definitions=self._definitions, strict=True, outer=self))
+            return self._register(compiled, node_id, key)
+
+        # Functions are returned as is, so their params are never built
+        if inspect.isfunction(obj):
+            if is_root:
+                self._complete = True
+            return self._register(_CompiledNode(obj, None, dict(), ()), node_id, key)
+
+        children = list()
+        values = dict()
+
+        for param, value in _get_params(node).items():
+            if _is_reference(value):
+                children.append((param, self._compile_reference(value[_REF_KEY])))
+                continue
+
+            child = _buildable(value)
+            if child:
+                children.append((param, self._compile(value, child)))
+            else:
+                values[param] = value
+
+        plan = ObjectCaller.get_call_plan(obj)
+        names = set(param for param, _ in children)
+        values = {param: value for param, value in _merge(node, values).items()
+                  if param not in names and param not in _SERVICE_KEYS}
+
+        if plan is not None:
+            defaults = plan.optional.copy()
+            defaults.update((param, value) for param, value in values.items() if param in plan.parameters)
+        else:
+            defaults = values
+
+        compiled = _CompiledNode(obj, plan, defaults, tuple(children))
+
+        provided = names.union(defaults)
+
+        # Root may still receive its missing parameters on build, unless the config is strict
+        if is_root:
+            self._complete = plan is None or all(param in provided for param in plan.required)
+
+        if not is_root or self._strict:
+            compiled.check(provided)
+
+        return self._register(compiled, node_id, key)
+
+    def _register(self, compiled: Union[_CompiledNode, _LazyNode], node_id: Any, key: Any) -> int:
+        self._nodes.append(compiled)
+        index = len(self._nodes) - 1
+
+        if node_id is not None:
+            self._compiling.discard(node_id)
+            self._ids[node_id] = index
+        if key is not None:
+            self._shared[key] = index
+
+        return index
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def _needed(self, overrides: Mapping) -> Optional[set]:
+        """Returns the nodes still required after overriding root params, `None` if all of them are."""
+
+        root = self._nodes[-1]
+        if not any(param in overrides for param, _ in root.children):
+            return None
+
+        # Overridden subtrees are not built at all, unless they're shared with the rest of the config
+        needed = set()
+        stack = [index for param, index in root.children if param not in overrides]
+        while stack:
+            index = stack.pop()
+            if index not in needed:
+                needed.add(index)
+                stack.extend(child for _, child in self._nodes[index].children)
+
+        return needed
+
+    def build(self, **overrides) -> Any:
+        """Builds the objects, the same as `instantiate(config, **overrides)` does."""
+
+        if self._lazy:
+            return LazyObject(partial(self._build, overrides))
+
+        return self._build(overrides)
+
+    __call__ = build
+
+    def _build(self, overrides: Mapping, outer: Optional[Mapping] = None) -> Any:
+        *nodes, root = self._nodes
+        needed = self._needed(overrides)
+
+        results = [None] * len(nodes)
+        for index, node in enumerate(nodes):
+            if isinstance(node, _ExternalNode):
+                results[index] = node.build(outer)
+            elif needed is None or index in needed:
+                results[index] = node.build(results)
+
+        return root.build(results, overrides, check=not self._complete)
+
+    def build_with(self, executor: Executor, **overrides) -> Any:
+        """Same as `build()`, but builds independent subtrees concurrently using the executor.
+
+        Every object is still built after all of its params, only the root is built in the calling thread.
+        If several objects fail, the error of the one that comes first in post-order is raised,
+        i. e. the same error a serial `build()` would raise.
+        Note that process pools require all the objects and params to be picklable.
+        Lazy root is built serially on the first use, since the executor may be gone by then.
+        """
+
+        if self._lazy:
+            return LazyObject(partial(self._build, overrides))
+
+        *nodes, root = self._nodes
+        needed = self._needed(overrides)
+
+        results = dict()
+        errors = dict()
+        pending = dict()
+
+        remaining = [len(set(child for _, child in node.children)) for node in nodes]
+        ready = deque(index for index, count in enumerate(remaining)
+                      if not count and (needed is None or index in needed))
+
+        while ready or pending:
+            while ready:
+                index = ready.popleft()
+
+                # Nodes after a failed one would never be reached serially
+                if errors and index > min(errors):
+                    continue
+
+                node = nodes[index]
+                pending[executor.submit(node.build, node.gather(results))] = index
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    errors[index] = e
+                    continue
+
+                for parent in self._parents[index]:
+                    if parent == len(nodes) or (needed is not None and parent not in needed):
+                        continue
+
+                    remaining[parent] -= 1
+                    if not remaining[parent]:
+                        ready.append(parent)
+
+        if errors:
+            raise errors[min(errors)]
+
+        return root.build(results, overrides, check=not self._complete)
+
+
+def compile(target_config: Mapping) -> CompiledConfig:
+    """Prepares a config for repeated instantiation.
+
+    Resolves all the targets and their signatures upfront, so that `CompiledConfig.build(**kwargs)`
+    is a cheap replacement for calling `instantiate(target_config, **kwargs)` again and again.
+    """
+
+    return CompiledConfig(target_config)
+
+
+def parallel_instantiate(target_config: Mapping, executor: Executor, **kwargs) -> Any:
+    """Same as `instantiate()`, but builds independent subtrees of the config concurrently.
+
+    Useful when siblings are expensive to build, e. g. models loading their weights.
+    See `CompiledConfig.build_with()` for details.
+    """
+
+    return compile(target_config).build_with(executor, **kwargs)
 
 
 def call(target_config: Mapping, *args, **kwargs) -> Any:
@@ -178,6 +673,9 @@ def set_random_seed(seed: Optional[int] = None) -> int:
         PyTorch, Numpy, python.random and sets PYTHONHASHSEED environment variable.
     """
 
+    import numpy as np
+    import torch
+
     max_seed_value = np.iinfo(np.uint32).max
     min_seed_value = np.iinfo(np.uint32).min
 
@@ -209,7 +707,10 @@ def _select_seed_randomly(min_seed_value: int = 0, max_seed_value: int = 255) ->
     return seed
 
 
-def as_numpy(obj) -> np.ndarray:
+def as_numpy(obj) -> "np.ndarray":
+    import numpy as np
+    import torch
+
     if isinstance(obj, torch.Tensor):
         return obj.detach().cpu().numpy()
 
@@ -225,7 +726,10 @@ def as_numpy(obj) -> np.ndarray:
     raise TypeError()
 
 
-def as_tensor(obj, dtype=None) -> torch.Tensor:
+def as_tensor(obj, dtype=None) -> "torch.Tensor":
+    import numpy as np
+    import torch
+
     if isinstance(obj, Number):
         return torch.tensor([obj], dtype=dtype)
 
@@ -258,7 +762,7 @@ def as_tensor(obj, dtype=None) -> torch.Tensor:
     raise TypeError()
 
 
-def transfer_weights(model: Module, state_dict: OrderedDict, verbose=False) -> Module:
+def transfer_weights(model: "Module", state_dict: OrderedDict, verbose=False) -> "Module":
     """Copies weights from the state dict into the model, skipping layers that are incompatible.
 
     It's helpful for model surgery and/or partial weights initialization.
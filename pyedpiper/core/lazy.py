@@ -0,0 +1,48 @@
+from importlib import import_module
+from typing import (
+    Callable,
+    Iterable,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+__all__ = ["attach"]
+
+
+def attach(package: str,
+           submodules: Optional[Iterable[str]] = None,
+           attributes: Optional[Mapping[str, str]] = None) -> Tuple[Callable, Callable]:
+    """Makes package attributes load lazily on the first access (PEP 562).
+
+    Usage:
+        __getattr__, __dir__ = attach(__name__, ["utils"], {"Foo": ".foo"})
+
+    Args:
+        package (str): Name of the package to attach to, i. e. `__name__`
+        submodules (Iterable[str]): Names of the submodules to import on access
+        attributes (Mapping[str, str]): Maps an attribute to the (relative) module it's defined in
+
+    Returns:
+        Tuple: module level `__getattr__` and `__dir__` functions
+    """
+
+    submodules = set(submodules or ())
+    attributes = dict(attributes or {})
+
+    def __getattr__(name: str):
+        if name in submodules:
+            value = import_module(f"{package}.{name}")
+        elif name in attributes:
+            value = getattr(import_module(attributes[name], package), name)
+        else:
+            raise AttributeError(f"module '{package}' has no attribute '{name}'")
+
+        # Cache the value, so that the next access doesn't even get here
+        setattr(import_module(package), name, value)
+        return value
+
+    def __dir__():
+        return sorted(submodules.union(attributes, vars(import_module(package))))
+
+    return __getattr__, __dir__
@@ -1,22 +1,22 @@
 import logging
 import os
+import sys
+import threading
 
 from importlib import import_module
 from importlib.util import module_from_spec
 from importlib.util import spec_from_file_location
 from pathlib import Path
-
-try:
-    import hydra
-
-    _HAS_HYDRA = True
-except ImportError:
-    _HAS_HYDRA = False
+from typing import Optional, Tuple
 
 log = logging.getLogger(__name__)
 
 
 class ModuleLoader:
+    # Resolved modules by the module path and project root
+    _cache = dict()
+    # Reentrant, since a local module may load other modules while it's executed
+    _lock = threading.RLock()
 
     @staticmethod
     def load_external_module(module_name):
@@ -52,18 +52,71 @@ class ModuleLoader:
 
     @classmethod
     def load_module(cls, module_path: str):
+        # Project root is a part of the key since relative local modules depend on it
+        key = (module_path, _get_project_root())
+
+        entry = cls._cache.get(key)
+        if entry is not None and entry.is_valid():
+            return entry.module
+
+        with cls._lock:
+            # Someone might have loaded it while we've been waiting
+            entry = cls._cache.get(key)
+            if entry is not None and entry.is_valid():
+                return entry.module
+
+            entry = cls._resolve_module(module_path)
+            cls._cache[key] = entry
+
+        log.debug("Module `{}` is loaded.".format(entry.module.__name__))
+        return entry.module
+
+    @classmethod
+    def clear_cache(cls):
+        """Forgets all the resolved modules, so that local ones are executed again on the next load."""
+        with cls._lock:
+            cls._cache.clear()
+
+    @classmethod
+    def _resolve_module(cls, module_path: str) -> "_CacheEntry":
         if _is_local_module(module_path):
             log.debug("Loading local module '{}' ...".format(module_path))
             full_path = _resolve_local_module(module_path)
+            stamp = _get_stamp(full_path)
             module = cls.load_local_module(full_path)
+            return _CacheEntry(module, full_path, stamp)
         elif _is_external_module(module_path):
             module = cls.load_external_module(module_path)
+            return _CacheEntry(module)
         else:
             error = "Can't load module `{}`. Provided module path is incorrect!".format(module_path)
             log.error(error)
             raise ModuleNotFoundError(error)
-        log.debug("Module `{}` is loaded.".format(module.__name__))
-        return module
+
+
+class _CacheEntry:
+    """Resolved module along with the state of its source file, if it's a local one."""
+
+    __slots__ = ('module', 'path', 'stamp')
+
+    def __init__(self, module, path: Optional[Path] = None, stamp: Optional[Tuple[int, int]] = None):
+        self.module = module
+        self.path = path
+        self.stamp = stamp
+
+    def is_valid(self) -> bool:
+        # External modules are cached by the import system anyway
+        return self.path is None or _get_stamp(self.path) == self.stamp
+
+
+def _get_stamp(path: Path) -> Optional[Tuple[int, int]]:
+    """Returns the modification time and size of the file, `None` if it's gone."""
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
 
 
 def _is_external_module(module_path) -> bool:
@@ -107,13 +160,14 @@ def _resolve_local_module(module_path):
 
 def _get_project_root() -> Path:
     # Check whether hydra runtime is running
-    # since it changes current working path
-    if _HAS_HYDRA:
+    # since it changes current working path.
+    # If hydra is not imported yet, it can't be running either
+    if "hydra" in sys.modules:
         from hydra.utils import get_original_cwd
         try:
             hydra_runtime_cwd = get_original_cwd()
             return Path(hydra_runtime_cwd)
-        except AttributeError:
+        except (AttributeError, ValueError):
             pass
 
     return Path(os.getcwd())
@@ -1,35 +1,46 @@
 import inspect
 import logging
+import threading
+import weakref
 
-from collections import OrderedDict, deque
+from collections import OrderedDict, deque, namedtuple
 
 log = logging.getLogger(__name__)
 
 _IGNORED_PARAMETERS = ('self', 'kwargs', 'args')
 
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "currsize"])
+
 
 def _is_required(param):
     return param.default is inspect.Parameter.empty
 
 
-class ObjectCaller:
+class CallPlan:
+    """Precomputed parameter layout of a callable.
 
-    @classmethod
-    def call_from_kwargs(cls, obj_type, *args, **kwargs):
-        """Tries to make an object call intelligently,
-           i. e. remove unnecessary arguments or notify in case some missing."""
+    Stores everything `ObjectCaller.call_from_kwargs` needs to know about a signature,
+    so that calling the same object again only costs a dict merge.
+    """
 
-        assert callable(obj_type), "Can call type or function objects only!"
+    __slots__ = ('name', 'required', 'optional', 'parameters')
 
-        name = obj_type.__name__
+    def __init__(self, name, required, optional):
+        self.name = name
+        self.required = tuple(required)
+        self.optional = optional
+        self.parameters = frozenset(self.required).union(optional)
+
+    @classmethod
+    def from_callable(cls, obj_type):
+        """Builds a plan for the callable or returns `None` if its signature is not accessible."""
 
         try:
             sign = inspect.signature(obj_type)
         except ValueError:
             # Some objects may raise ValueError at this point
             # meaning, that we can't get access to their signature for some reason.
-            # In such cases just fallback to a lazy call:
-            return obj_type(*args, **kwargs)
+            return None
 
         ignored = list(_IGNORED_PARAMETERS)
 
@@ -37,7 +48,7 @@ class ObjectCaller:
         if inspect.isfunction(obj_type) and not inspect.ismethod(obj_type):
             ignored.remove('self')
 
-        required_parameters = OrderedDict()
+        required_parameters = list()
         optional_parameters = OrderedDict()
 
         # Collect all the necessary params
@@ -46,40 +57,109 @@ class ObjectCaller:
                 continue
 
             if _is_required(value):
-                required_parameters[name] = None
+                required_parameters.append(name)
                 continue
 
             optional_parameters[name] = value.default
 
+        name = getattr(obj_type, '__name__', repr(obj_type))
+        return cls(name, required_parameters, optional_parameters)
+
+    def check(self, provided):
+        """Raises if some of the required parameters are not among the provided names."""
+
+        if any(name not in provided for name in self.required):
+            error = ("Not enough parameters provided! "
+                     "Required parameters are: {}".format(', '.join(self.required)))
+            raise Exception(error)
+
+    def bind(self, args, kwargs):
+        """Maps positional and keyword arguments onto the planned parameters."""
+
         # First try to map the args
         if args:
             q = deque(args)
-            for name, value in required_parameters.items():
+            for name in self.required:
                 kwargs[name] = q.popleft()
                 if not q:
                     break
 
-        provided_parameters = kwargs.keys()
+        self.check(kwargs)
 
-        required_set = set(required_parameters)
-        provided_set = set(provided_parameters)
-        optional_set = set(optional_parameters)
+        ingredients = self.optional.copy()
+        ingredients.update((name, value) for name, value in kwargs.items() if name in self.parameters)
+        return ingredients
 
-        intersection = required_set.intersection(provided_set)
-        try:
-            diff = len(required_set) - len(intersection)
-            if diff:
-                error = ("Not enough parameters provided! "
-                         "Required parameters are: {}".format(', '.join(required_parameters)))
-                raise Exception(error)
+
+class ObjectCaller:
+    # Plans are keyed weakly, so that classes from dynamically loaded modules can still be collected
+    _plans = weakref.WeakKeyDictionary()
+    _lock = threading.Lock()
+    _hits = 0
+    _misses = 0
+
+    @classmethod
+    def get_call_plan(cls, obj_type):
+        """Returns a cached `CallPlan` for the callable, building it on the first request."""
+
+        with cls._lock:
+            try:
+                plan = cls._plans[obj_type]
+            except (KeyError, TypeError):
+                pass
             else:
-                overrides = optional_parameters.copy()
-                overrides.update(kwargs)
-                signature = optional_set.union(required_set)
-                ingredients = {parameter: overrides[parameter] for parameter in signature}
-                return obj_type(**ingredients)
+                cls._hits += 1
+                return plan
+
+        plan = CallPlan.from_callable(obj_type)
+
+        with cls._lock:
+            cls._misses += 1
+            try:
+                cls._plans[obj_type] = plan
+            except TypeError:
+                # Objects that can't be weakly referenced or hashed are never cached
+                pass
+
+        return plan
+
+    @classmethod
+    def cache_info(cls) -> CacheInfo:
+        """Reports call plan cache statistics."""
+        with cls._lock:
+            return CacheInfo(cls._hits, cls._misses, len(cls._plans))
+
+    @classmethod
+    def cache_clear(cls):
+        """Drops all cached call plans and resets the statistics."""
+        with cls._lock:
+            cls._plans.clear()
+            cls._hits = 0
+            cls._misses = 0
+
+    @classmethod
+    def call_from_kwargs(cls, obj_type, *args, **kwargs):
+        """Tries to make an object call intelligently,
+           i. e. remove unnecessary arguments or notify in case some missing."""
+
+        assert callable(obj_type), "Can call type or function objects only!"
+
+        plan = cls.get_call_plan(obj_type)
+        return cls.call_with_plan(obj_type, plan, *args, **kwargs)
+
+    @classmethod
+    def call_with_plan(cls, obj_type, plan, *args, **kwargs):
+        """Same as `call_from_kwargs()`, but uses an already resolved call plan."""
+
+        if plan is None:
+            # Signature is not available, fallback to a lazy call
+            return obj_type(*args, **kwargs)
+
+        try:
+            ingredients = plan.bind(args, kwargs)
+            return obj_type(**ingredients)
         except Exception as e:
-            error = "Can't call `{}`: {}".format(name, e)
+            error = "Can't call `{}`: {}".format(plan.name, e)
             log.error(error)
             raise e
 
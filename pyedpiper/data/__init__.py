@@ -1,12 +1,61 @@
-from .datasets import (
-    BaseDataset,
-    ImageDataset
-)
-from .imbalanced import ImbalancedDatasetSampler
-from .utils import (
-    file_loader,
-    get_class_weights,
-    numpy_loader,
-    plt_loader,
-    pil_loader,
+from ..core.lazy import attach
+
+__getattr__, __dir__ = attach(
+    __name__,
+    submodules=[
+        "cache",
+        "datasets",
+        "files",
+        "imbalanced",
+        "packed",
+        "storage",
+        "utils",
+    ],
+    attributes={
+        "BaseDataset": ".datasets",
+        "DiskImageCache": ".cache",
+        "DistributedImbalancedDatasetSampler": ".imbalanced",
+        "ImageCache": ".cache",
+        "ImageDataset": ".datasets",
+        "ImbalancedDatasetSampler": ".imbalanced",
+        "LRUImageCache": ".cache",
+        "ObjectStorage": ".storage",
+        "PackedDataset": ".packed",
+        "PackedPaths": ".files",
+        "Storage": ".storage",
+        "available_decoders": ".utils",
+        "file_loader": ".utils",
+        "get_class_weights": ".utils",
+        "get_decoder": ".utils",
+        "numpy_loader": ".utils",
+        "pack_dataset": ".packed",
+        "plt_loader": ".utils",
+        "pil_loader": ".utils",
+        "register_decoder": ".utils",
+        "scan_files": ".files",
+    },
 )
+
+__all__ = [
+    "BaseDataset",
+    "DiskImageCache",
+    "DistributedImbalancedDatasetSampler",
+    "ImageCache",
+    "ImageDataset",
+    "ImbalancedDatasetSampler",
+    "LRUImageCache",
+    "ObjectStorage",
+    "PackedDataset",
+    "PackedPaths",
+    "Storage",
+    "available_decoders",
+    "file_loader",
+    "get_class_weights",
+    "get_decoder",
+    "numpy_loader",
+    "pack_dataset",
+    "plt_loader",
+    "pil_loader",
+    "register_decoder",
+    "scan_files",
+]
@@ -0,0 +1,249 @@
+import hashlib
+import logging
+import os
+import threading
+
+import numpy as np
+
+from abc import ABCMeta
+from abc import abstractmethod
+from collections import OrderedDict, namedtuple
+from pathlib import Path
+from typing import (
+    Callable,
+    Optional,
+    Union,
+)
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "currsize", "currbytes"])
+
+__all__ = ["CacheInfo", "DiskImageCache", "ImageCache", "LRUImageCache"]
+
+
+class ImageCache(metaclass=ABCMeta):
+    """Cache of decoded images, keyed by their paths.
+
+    Counters are kept per process, so with `DataLoader` workers every worker reports its own statistics.
+    """
+
+    def __init__(self):
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Returns a writable copy of the cached image or `None`."""
+
+        image = self._get(key)
+        with self._lock:
+            if image is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return image
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[np.ndarray]:
+        pass
+
+    @abstractmethod
+    def put(self, key: str, image: np.ndarray):
+        pass
+
+    @abstractmethod
+    def cache_info(self) -> CacheInfo:
+        pass
+
+    def cache_clear(self):
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        with self._lock:
+            total = self._hits + self._misses
+            return self._hits / total if total else 0.0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(_lock=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+class LRUImageCache(ImageCache):
+    """In-process cache that evicts the least recently used images beyond the byte budget.
+
+    Args:
+        max_bytes (int): Budget for the total size of the cached images
+    """
+
+    def __init__(self, max_bytes: int):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self._images = OrderedDict()
+        self._bytes = 0
+
+    def _get(self, key):
+        with self._lock:
+            image = self._images.get(key)
+            if image is None:
+                return None
+
+            self._images.move_to_end(key)
+
+        return image.copy()
+
+    def put(self, key, image):
+        if image.nbytes > self.max_bytes:
+            return
+
+        image = image.copy()
+        with self._lock:
+            previous = self._images.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+
+            self._images[key] = image
+            self._bytes += image.nbytes
+
+            while self._bytes > self.max_bytes:
+                _, evicted = self._images.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def cache_info(self):
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, len(self._images), self._bytes)
+
+    def cache_clear(self):
+        with self._lock:
+            super().cache_clear()
+            self._images.clear()
+            self._bytes = 0
+
+    def __getstate__(self):
+        # Images aren't sent to spawned workers, every worker fills its own cache
+        state = super().__getstate__()
+        state.update(_images=OrderedDict(), _bytes=0)
+        return state
+
+
+class DiskImageCache(ImageCache):
+    """Cache of `.npy` files shared by all the processes pointed to the same directory.
+
+    Images are read through `mmap`, so the page cache is shared between `DataLoader` workers.
+    Point `directory` to a tmpfs such as `/dev/shm` to keep the images in shared memory.
+
+    The budget is shared as well: the total size of the images is kept in the `.usage` file of the directory
+    and updated under a file lock. Where `fcntl` isn't available (i. e. on Windows) every process only accounts
+    for the images found on start and the ones it has written itself.
+
+    Args:
+        directory (str, Path): Directory for the cached images, created if missing
+        max_bytes (int, optional): Budget for the total size of the files, new images aren't cached beyond it
+    """
+
+    def __init__(self, directory: Union[str, Path], max_bytes: Optional[int] = None):
+        super().__init__()
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._usage_path = self.directory / '.usage'
+        self._bytes = self._scan() if fcntl is None else None
+
+    def _scan(self) -> int:
+        return sum(entry.stat().st_size for entry in os.scandir(self.directory) if entry.name.endswith('.npy'))
+
+    def _account(self, update: Callable[[int], int]) -> int:
+        """Replaces the total size of the images with `update(total)`, atomically for all the processes."""
+
+        with self._lock:
+            if fcntl is None:
+                self._bytes = update(self._bytes)
+                return self._bytes
+
+            with os.fdopen(os.open(self._usage_path, os.O_RDWR | os.O_CREAT), 'r+b') as file:
+                fcntl.flock(file, fcntl.LOCK_EX)
+                try:
+                    content = file.read()
+                    total = int(content) if content else self._scan()
+                    updated = update(total)
+                    if updated != total or not content:
+                        file.seek(0)
+                        file.truncate()
+                        file.write(str(updated).encode())
+                        file.flush()
+                    return updated
+                finally:
+                    fcntl.flock(file, fcntl.LOCK_UN)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / (hashlib.sha1(key.encode()).hexdigest() + '.npy')
+
+    def _get(self, key):
+        try:
+            return np.array(np.load(self._path(key), mmap_mode='r'))
+        except (OSError, ValueError):
+            return None
+
+    def _fits(self, total: int, size: int) -> bool:
+        return self.max_bytes is None or total + size <= self.max_bytes
+
+    def put(self, key, image):
+        path = self._path(key)
+        temporary = path.with_name(f"{path.stem}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+        def store(total):
+            previous = path.stat().st_size if path.exists() else 0
+            if not self._fits(total - previous, size):
+                return total
+
+            # Concurrent readers see either no file or the complete one
+            os.replace(temporary, path)
+            return total - previous + size
+
+        try:
+            # Full cache isn't written to at all, unless the image replaces another one
+            if not path.exists() and not self._fits(self._account(lambda total: total), image.nbytes):
+                return
+
+            with open(temporary, 'wb') as file:
+                np.save(file, image)
+            size = temporary.stat().st_size
+
+            self._account(store)
+
+        except OSError as e:
+            log.warning(f"Can't cache image `{key}`: {e}")
+
+        finally:
+            try:
+                temporary.unlink()
+            except FileNotFoundError:
+                pass
+
+    def cache_info(self):
+        currbytes = self._account(lambda total: total)
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, len(list(self.directory.glob('*.npy'))), currbytes)
+
+    def cache_clear(self):
+        def clear(total):
+            for path in self.directory.glob('*.npy'):
+                path.unlink()
+            return 0
+
+        self._account(clear)
+        with self._lock:
+            super().cache_clear()
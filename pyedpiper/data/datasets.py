@@ -1,21 +1,34 @@
 import logging
+import os
 import numpy as np
 import pandas as pd
+import torch
 
 from abc import ABCMeta
 from abc import abstractmethod
-from copy import deepcopy
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import (
     Callable,
     Iterable,
+    List,
     Optional,
     Union,
 )
 
 from torch.utils.data import Dataset
 
-from .utils import plt_loader
+try:
+    from torch.utils.data import default_collate
+except ImportError:
+    # Public since torch 1.11
+    from torch.utils.data._utils.collate import default_collate
+
+from .cache import ImageCache
+from .files import PackedPaths, scan_files
+from .storage import Storage
+from .utils import get_decoder
 
 log = logging.getLogger(__name__)
 
@@ -24,6 +37,16 @@ def _clean_path(path: Union[str, Path]) -> str:
     return (str(path)).split('/')[-1].split('.')[0]
 
 
+def _file_name(path: Union[str, Path]) -> str:
+    return Path(path).name
+
+
+def _describe(message: str, names, limit: int = 5) -> str:
+    shown = ', '.join(f"`{name}`" for name in names[:limit])
+    more = f" and {len(names) - limit} more" if len(names) > limit else ""
+    return f"{message} ({len(names)}): {shown}{more}"
+
+
 class BaseDataset(Dataset, metaclass=ABCMeta):
 
     def __init__(self,
@@ -34,28 +57,49 @@ class BaseDataset(Dataset, metaclass=ABCMeta):
                  extensions: Iterable[str],
                  loader: Callable,
                  transform: Optional[Callable] = None,
-                 extract_filename: Optional[Callable] = None):
+                 extract_filename: Optional[Callable] = None,
+                 recursive: bool = False,
+                 scan_workers: Optional[int] = None,
+                 index_cache: Optional[Union[str, Path, bool]] = None,
+                 compact: bool = False,
+                 io_threads: int = 0,
+                 storage: Optional[Storage] = None):
 
         super().__init__()
 
         self.root = Path(root)
-        self.labels = deepcopy(labels)
+        self.labels = labels
         self.transform = transform
         self.loader = loader
         self.extensions = extensions
         self.index = index
         self.key = key
+        self.recursive = recursive
+        self.scan_workers = scan_workers
+        self.index_cache = index_cache
+        self.io_threads = io_threads
+        self.storage = storage
         self.files = list()
 
+        self._pool = None
+        self._pool_pid = None
+
         self._prepare_extensions()
         self._prepare_labels()
         self._prepare_files()
 
         self._extract_filename = self._setup_filename_extractor(user_callback=extract_filename)
-        self._get_target = self._setup_target_getter()
 
-        self.targets = [self._get_target(self._extract_filename(file)) for file in self.files]
-        self.samples = list(zip(self.files, self.targets))
+        self.targets = self._join_targets([self._extract_filename(file) for file in self.files])
+
+        if compact:
+            # No per-sample Python objects are left, so forked workers don't copy the pages on read
+            self.files = PackedPaths(self.files, root=self.root)
+            self.targets = _compact_targets(self.targets)
+            self.samples = _PackedSamples(self.files, self.targets)
+            self.labels = None
+        else:
+            self.samples = list(zip(self.files, self.targets))
 
     def _setup_filename_extractor(self, user_callback):
         class AmbiguousFileExtensionError(Exception):
@@ -70,15 +114,15 @@ class BaseDataset(Dataset, metaclass=ABCMeta):
                 # Validate that files in the directory have only one extension
                 for path in self.files:
 
-                    if len(path.suffixes) > 1:
+                    if len(Path(path).suffixes) > 1:
                         error = ("Files have more than one extension. "
                                  "Please provide your own `extract_filename` function.")
                         log.error(error)
                         raise AmbiguousFileExtensionError(error)
 
-                return lambda filepath: filepath
+                return _file_name
 
-            return lambda filepath: _clean_path(filepath)
+            return _clean_path
 
         else:
             error = f"`extract_filename` type `{type(user_callback)}` is not callable!"
@@ -106,31 +150,31 @@ class BaseDataset(Dataset, metaclass=ABCMeta):
         else:
             return all_with_extension
 
-    def _setup_target_getter(self):
+    def _join_targets(self, names: List[str]) -> np.ndarray:
+        """Looks up targets of all the files at once, reporting every missing or duplicated label together."""
 
         if isinstance(self.labels, pd.DataFrame):
             # Try to setup indexing
             if isinstance(self.labels.index, pd.RangeIndex):
                 try:
-                    self.labels.set_index(self.index, inplace=True)
+                    self.labels = self.labels.set_index(self.index)
                 except KeyError as e:
                     raise ValueError(f"Labels DataFrame should contain the '{self.index}' column. \n{e}")
 
-            getter = lambda idx: self.labels.loc[idx][self.key]
+            column = self.labels[self.key]
 
         elif isinstance(self.labels, dict):
-            # Then it's a dict
             if self.key:
                 item = next(iter(self.labels.values()))
                 assert isinstance(item, dict), (
                     f"Using `key` attribute with dict typed labels implies nested dicts. Got `{type(item)}` instead."
                 )
-                getter = lambda idx: self.labels[idx][self.key]
+                column = pd.Series({idx: value[self.key] for idx, value in self.labels.items()})
             else:
-                getter = lambda idx: self.labels[idx]
+                column = pd.Series(self.labels)
 
         elif isinstance(self.labels, int):
-            getter = lambda idx: self.labels
+            return np.full(len(names), self.labels)
         else:
             error = (f"Labels of type: `{type(self.labels)}` are not allowed."
                      "Use one of: `int`, `dict`, `pandas.DataFrame`")
@@ -138,7 +182,20 @@ class BaseDataset(Dataset, metaclass=ABCMeta):
             log.error(error)
             raise TypeError(error)
 
-        return getter
+        duplicated = column.index.duplicated()
+        if duplicated.any():
+            error = _describe("Labels have duplicated entries", column.index[duplicated].unique())
+            log.error(error)
+            raise ValueError(error)
+
+        positions = column.index.get_indexer(names)
+        missing = positions < 0
+        if missing.any():
+            error = _describe("Labels are missing for files", np.asarray(names, dtype=object)[missing])
+            log.error(error)
+            raise KeyError(error)
+
+        return column.to_numpy()[positions]
 
     def __len__(self):
         return len(self.samples)
@@ -147,6 +204,58 @@ class BaseDataset(Dataset, metaclass=ABCMeta):
     def __getitem__(self, idx):
         pass
 
+    def __getitems__(self, indices: List[int]) -> list:
+        """Loads a batch of samples, concurrently with `io_threads` threads. Used by `DataLoader` automatically."""
+
+        if self.storage is not None:
+            # Warms up the local cache with concurrent downloads of the whole batch
+            self.storage.fetch_many([self.samples[idx][0] for idx in indices])
+
+        if not self.io_threads or len(indices) < 2:
+            return [self[idx] for idx in indices]
+
+        return list(self._get_pool().map(self.__getitem__, indices))
+
+    def get_batch(self, indices: List[int]):
+        """Loads samples concurrently and collates them into batch tensors, e.g. uint8 images and targets."""
+
+        return default_collate(self.__getitems__(indices))
+
+    def load_sample(self, path):
+        """Loads a sample as it is before the transform, e.g. to pack it with `pack_dataset`."""
+
+        return self.loader(self._fetch(path))
+
+    def _fetch(self, path) -> Union[str, Path]:
+        """Returns a path the loader can read, downloading the file from the storage if there's one."""
+
+        return path if self.storage is None else self.storage.fetch(path)
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        # Threads don't survive a fork, so every worker process starts its own pool
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = ThreadPoolExecutor(max_workers=self.io_threads, thread_name_prefix='pyedpiper-io')
+            self._pool_pid = os.getpid()
+
+        return self._pool
+
+    def close(self):
+        """Shuts down the threads loading batches, the next batch starts them again."""
+
+        pool, self._pool, self._pool_pid = self._pool, None, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def __del__(self):
+        # The pool is missing if the initialization has failed
+        if getattr(self, '_pool', None) is not None:
+            self.close()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(_pool=None, _pool_pid=None)
+        return state
+
     def _prepare_labels(self):
         if isinstance(self.labels, (Path, str)):
             self.labels = pd.read_csv(self.labels)
@@ -155,12 +264,41 @@ class BaseDataset(Dataset, metaclass=ABCMeta):
         self.extensions = tuple(map(lambda ext: ext[1:] if ext.startswith('.') else ext, self.extensions))
 
     def _prepare_files(self):
-        files = list()
-        for ext in self.extensions:
-            files += list(self.root.glob(f'*.{ext}'))
+        if self.storage is not None:
+            # The root is a key prefix within the storage then
+            self.files = self.storage.list(str(self.root), self.extensions, recursive=self.recursive)
+        else:
+            self.files = scan_files(self.root,
+                                    self.extensions,
+                                    recursive=self.recursive,
+                                    num_workers=self.scan_workers,
+                                    cache_dir=self.index_cache)
+        assert self.files, "Files with the specified extensions can't be found!"
+
+
+def _compact_targets(targets: np.ndarray) -> np.ndarray:
+    if targets.dtype != object:
+        return targets
+
+    # E.g. string labels become a fixed width unicode array
+    compact = np.array(targets.tolist())
+    return targets if compact.dtype == object else compact
+
+
+class _PackedSamples(Sequence):
 
+    def __init__(self, files: PackedPaths, targets: np.ndarray):
         self.files = files
-        assert self.files, "Files with the specified extensions can't be found!"
+        self.targets = targets
+
+    def __len__(self):
+        return len(self.targets)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+
+        return self.files[idx], self.targets[idx]
 
 
 def _get_unified_transform(t: Callable):
@@ -180,6 +318,9 @@ def _get_unified_transform(t: Callable):
 IMG_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.ppm', '.bmp', '.pgm', '.tif', '.tiff', '.webp')
 
 
+_TENSOR_CACHE_ERROR = "Image caches store arrays, use a loader returning arrays along with `cache`"
+
+
 class ImageDataset(BaseDataset):
 
     def __init__(self,
@@ -188,9 +329,16 @@ class ImageDataset(BaseDataset):
                  key: str,
                  index: str,
                  extensions: Iterable[str] = IMG_EXTENSIONS,
-                 loader: Callable = plt_loader,
+                 loader: Optional[Callable] = None,
                  transform: Optional[Callable] = None,
-                 extract_filename: Optional[Callable] = None):
+                 extract_filename: Optional[Callable] = None,
+                 recursive: bool = False,
+                 scan_workers: Optional[int] = None,
+                 index_cache: Optional[Union[str, Path, bool]] = None,
+                 compact: bool = False,
+                 io_threads: int = 0,
+                 storage: Optional[Storage] = None,
+                 cache: Optional[ImageCache] = None):
 
         super().__init__(
             root=root,
@@ -198,20 +346,58 @@ class ImageDataset(BaseDataset):
             key=key,
             index=index,
             extensions=extensions,
-            loader=loader,
+            loader=loader if loader is not None else get_decoder(),
             transform=transform,
             extract_filename=extract_filename,
+            recursive=recursive,
+            scan_workers=scan_workers,
+            index_cache=index_cache,
+            compact=compact,
+            io_threads=io_threads,
+            storage=storage,
         )
         self.transform = _get_unified_transform(self.transform)
+        self.cache = cache
 
-    def __getitem__(self, idx):
-        path, target = self.samples[idx]
-        image = self.loader(path)
+        if cache is not None and getattr(self.loader, 'keywords', {}).get('as_tensor'):
+            error = _TENSOR_CACHE_ERROR
+            log.error(error)
+            raise ValueError(error)
+
+    def load_sample(self, path) -> Union[np.ndarray, torch.Tensor]:
+        key = str(path)
+        if self.cache is not None:
+            image = self.cache.get(key)
+            if image is not None:
+                return image
+
+        image = self.loader(self._fetch(path))
+
+        # Tensors come from loaders such as `get_decoder('torchvision', as_tensor=True)`
+        if isinstance(image, torch.Tensor):
+            if self.cache is not None:
+                error = _TENSOR_CACHE_ERROR
+                log.error(error)
+                raise TypeError(error)
 
+            if image.dtype == torch.float32:
+                image = image.mul(255).clamp_(0, 255).to(torch.uint8)
+            return image
+
+        # Decoders return uint8 already, floats come from custom loaders such as `plt_loader`
         if image.dtype == np.float32:
             image *= 255
             image = image.clip(0, 255).astype(np.uint8)
 
+        if self.cache is not None:
+            self.cache.put(key, image)
+
+        return image
+
+    def __getitem__(self, idx):
+        path, target = self.samples[idx]
+        image = self.load_sample(path)
+
         if self.transform:
             image = self.transform(image)
 
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+
+from collections.abc import Sequence
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+log = logging.getLogger(__name__)
+
+_INDEX_VERSION = 2
+_DEFAULT_CACHE_DIR = Path("~/.cache/pyedpiper/file_index")
+
+__all__ = ["PackedPaths", "scan_files"]
+
+
+def scan_files(root: Union[str, Path],
+               extensions: Iterable[str],
+               recursive: bool = False,
+               num_workers: Optional[int] = None,
+               cache_dir: Optional[Union[str, Path, bool]] = None) -> List[Path]:
+    """Lists the files with the given extensions under the root directory in a single pass.
+
+    Args:
+        root (str, Path): Directory to scan
+        extensions (Iterable[str]): File extensions with or without the leading dot, e.g. `('jpg', '.png')`
+        recursive (bool): Whether to scan the subdirectories as well, symbolic links to directories aren't followed
+        num_workers (int, optional): Number of threads to scan the subdirectories with, helps on network filesystems
+        cache_dir (str, Path, bool, optional): Directory to persist the file index in, `True` for the default one.
+            The index is reused as long as modification times of all the scanned directories stay the same.
+
+    Returns:
+        List[Path]: Sorted paths of the files found
+    """
+
+    root = Path(root)
+    suffixes = tuple(sorted(set('.' + ext.lstrip('.') for ext in extensions)))
+
+    index_path = None
+    if cache_dir:
+        cache_dir = _DEFAULT_CACHE_DIR if cache_dir is True else Path(cache_dir)
+        index_path = _get_index_path(cache_dir.expanduser(), root, suffixes, recursive)
+
+        files = _load_index(index_path, root)
+        if files is not None:
+            log.debug(f"Using file index `{index_path}` for `{root}`.")
+            return [root / file for file in files]
+
+    files, directories = _scan(root, suffixes, recursive, num_workers)
+    files.sort()
+
+    if index_path is not None:
+        _save_index(index_path, files, directories)
+
+    return [root / file for file in files]
+
+
+def _scan_directory(root: Path, relative: str, suffixes: Tuple[str, ...]):
+    path = root / relative if relative else root
+
+    # Modification time is taken before listing, so changes made meanwhile invalidate the index
+    mtime = os.stat(path).st_mtime_ns
+
+    files = list()
+    subdirectories = list()
+    with os.scandir(path) as entries:
+        for entry in entries:
+            name = os.path.join(relative, entry.name) if relative else entry.name
+            # Symlinked directories could make a cycle
+            if entry.is_dir(follow_symlinks=False):
+                subdirectories.append(name)
+            elif entry.name.endswith(suffixes) and entry.is_file():
+                files.append(name)
+
+    return mtime, files, subdirectories
+
+
+def _scan(root: Path, suffixes: Tuple[str, ...], recursive: bool, num_workers: Optional[int]):
+    files = list()
+    directories = dict()
+
+    if not recursive or not num_workers or num_workers < 2:
+        queue = ['']
+        while queue:
+            relative = queue.pop()
+            mtime, found, subdirectories = _scan_directory(root, relative, suffixes)
+            directories[relative] = mtime
+            files.extend(found)
+            if recursive:
+                queue.extend(subdirectories)
+
+        return files, directories
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        pending = {executor.submit(_scan_directory, root, '', suffixes): ''}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                relative = pending.pop(future)
+                mtime, found, subdirectories = future.result()
+                directories[relative] = mtime
+                files.extend(found)
+                for subdirectory in subdirectories:
+                    pending[executor.submit(_scan_directory, root, subdirectory, suffixes)] = subdirectory
+
+    return files, directories
+
+
+def _get_index_path(cache_dir: Path, root: Path, suffixes: Tuple[str, ...], recursive: bool) -> Path:
+    key = json.dumps([str(root.resolve()), suffixes, recursive])
+    return cache_dir / (hashlib.sha1(key.encode()).hexdigest() + '.index')
+
+
+def _load_index(index_path: Path, root: Path) -> Optional[List[str]]:
+    """Returns the indexed files if none of the scanned directories have changed since."""
+
+    try:
+        with open(index_path, 'r', encoding='utf-8', errors='surrogateescape', newline='') as file:
+            header = json.loads(file.readline())
+            if header.get('version') != _INDEX_VERSION:
+                return None
+
+            for relative, mtime in header['directories'].items():
+                if os.stat(root / relative).st_mtime_ns != mtime:
+                    return None
+
+            files = file.read()
+            return files.split('\0') if files else []
+
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _save_index(index_path: Path, files: List[str], directories: Dict[str, int]):
+    header = {'version': _INDEX_VERSION, 'directories': directories}
+    temporary = index_path.with_name(f"{index_path.name}.{os.getpid()}.tmp")
+
+    try:
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        # Names may contain line breaks, but never NUL
+        with open(temporary, 'w', encoding='utf-8', errors='surrogateescape', newline='') as file:
+            file.write(json.dumps(header) + '\n')
+            file.write('\0'.join(files))
+
+        # Other processes never see a partially written index
+        os.replace(temporary, index_path)
+
+    except OSError as e:
+        log.warning(f"Can't save file index `{index_path}`: {e}")
+
+
+class PackedPaths(Sequence):
+    """Read-only sequence of paths packed into a single byte buffer.
+
+    Unlike a list of `Path` objects, reading it doesn't touch per-item reference counts,
+    so forked `DataLoader` workers keep sharing its memory pages with the parent process.
+    Items are decoded to `str`, since `Path` interns every path component it's built from.
+
+    Args:
+        paths (Iterable[Path]): Paths to pack
+        root (Path, optional): Common parent of the paths, only the parts relative to it are stored
+    """
+
+    def __init__(self, paths: Iterable[Union[str, Path]], root: Optional[Union[str, Path]] = None):
+        self.root = str(root) if root is not None else None
+
+        encoded = [os.fsencode(self._relative(str(path))) for path in paths]
+        self.offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(path) for path in encoded], out=self.offsets[1:])
+        self.buffer = np.frombuffer(b''.join(encoded), dtype=np.uint8).copy()
+
+    def _relative(self, path: str) -> str:
+        if self.root is None:
+            return path
+
+        prefix = os.path.join(self.root, '')
+        return path[len(prefix):] if path.startswith(prefix) else os.path.relpath(path, self.root)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("PackedPaths index out of range")
+
+        path = os.fsdecode(self.buffer[self.offsets[idx]:self.offsets[idx + 1]].tobytes())
+        return path if self.root is None else os.path.join(self.root, path)
@@ -1,8 +1,10 @@
 # Brought from https://github.com/ufoym/imbalanced-dataset-sampler to avoid excessive dependencies
 
+import sys
+
+import numpy as np
 import torch
 import torch.utils.data
-import torchvision
 
 
 class ImbalancedDatasetSampler(torch.utils.data.sampler.Sampler):
@@ -10,22 +12,34 @@ class ImbalancedDatasetSampler(torch.utils.data.sampler.Sampler):
 
     https://github.com/ufoym/imbalanced-dataset-sampler
 
+    Every element is weighted by the inverse frequency of its label, so every label is equally likely.
+    Draws pick a label uniformly and then an element of that label uniformly, so each one takes constant time.
+
+    Labels are read in one go from the `targets` of the dataset when it has them
+    (e.g. `BaseDataset`, `ImageFolder`, `MNIST` or a `Subset` of those).
+
     Arguments:
         indices (list, optional): a list of indices
         num_samples (int, optional): number of samples to draw
         callback_get_label func: a callback-like function which takes two arguments - dataset and index
+        generator (torch.Generator, optional): generator used for sampling
     """
 
-    def __init__(self, dataset, indices=None, num_samples=None, callback_get_label=None):
-        super().__init__(dataset)
+    def __init__(self, dataset, indices=None, num_samples=None, callback_get_label=None, generator=None):
+        try:
+            super().__init__(dataset)
+        except TypeError:
+            # Newer torch doesn't take the data source anymore
+            super().__init__()
 
         # if indices is not provided,
         # all elements in the dataset will be considered
-        self.indices = list(range(len(dataset))) \
+        self.indices = range(len(dataset)) \
             if indices is None else indices
 
         # define custom callback
         self.callback_get_label = callback_get_label
+        self.generator = generator
 
         # if num_samples is not provided,
         # draw `len(indices)` samples in each iteration
@@ -33,34 +47,154 @@ class ImbalancedDatasetSampler(torch.utils.data.sampler.Sampler):
             if num_samples is None else num_samples
 
         # distribution of classes in the dataset
-        label_to_count = {}
-        for idx in self.indices:
-            label = self._get_label(dataset, idx)
-            if label in label_to_count:
-                label_to_count[label] += 1
-            else:
-                label_to_count[label] = 1
-
-        # weight for each sample
-        weights = [1.0 / label_to_count[self._get_label(dataset, idx)]
-                   for idx in self.indices]
-        self.weights = torch.DoubleTensor(weights)
-
-    def _get_label(self, dataset, idx):
-        if isinstance(dataset, torchvision.datasets.MNIST):
-            return dataset.train_labels[idx].item()
-        elif isinstance(dataset, torchvision.datasets.ImageFolder):
-            return dataset.imgs[idx][1]
+        labels = self._get_labels(dataset, np.asarray(self.indices, dtype=np.int64))
+        _, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+        inverse = inverse.reshape(-1)
+
+        # positions of the elements grouped by label
+        order = np.argsort(inverse, kind='stable')
+        self._order = torch.from_numpy(np.asarray(self.indices, dtype=np.int64)[order])
+        self._counts = torch.from_numpy(counts)
+        self._starts = torch.from_numpy(np.cumsum(counts) - counts)
+        self._inverse = inverse
+
+    @property
+    def weights(self):
+        """Weight of every element, as in `torch.multinomial(weights, num_samples, replacement=True)`."""
+
+        return 1.0 / self._counts.double()[torch.from_numpy(self._inverse)]
+
+    def _get_labels(self, dataset, indices):
+        # Datasets can't be from torchvision unless it's already imported
+        torchvision = sys.modules.get("torchvision")
+
+        if torchvision is not None and isinstance(dataset, (torchvision.datasets.MNIST,
+                                                            torchvision.datasets.ImageFolder)):
+            return self._take(dataset.targets, indices)
         elif isinstance(dataset, torch.utils.data.Subset):
-            return dataset.dataset.imgs[idx][1]
+            return self._get_labels(dataset.dataset, np.asarray(dataset.indices, dtype=np.int64)[indices])
         elif self.callback_get_label:
-            return self.callback_get_label(dataset, idx)
+            return np.array([self.callback_get_label(dataset, idx) for idx in indices.tolist()])
+        elif getattr(dataset, 'targets', None) is not None:
+            return self._take(dataset.targets, indices)
         else:
             raise NotImplementedError
 
+    @staticmethod
+    def _take(targets, indices):
+        if isinstance(targets, torch.Tensor):
+            targets = targets.cpu().numpy()
+        return np.asarray(targets)[indices]
+
+    def _draw(self, num_samples, generator=None):
+        # every label has the same total weight
+        labels = torch.randint(len(self._counts), (num_samples,), generator=generator)
+        counts = self._counts[labels]
+        offsets = (torch.rand(num_samples, dtype=torch.float64, generator=generator) * counts).long()
+        return self._order[self._starts[labels] + torch.min(offsets, counts - 1)]
+
     def __iter__(self):
-        return (self.indices[i] for i in torch.multinomial(
-            self.weights, self.num_samples, replacement=True))
+        return iter(self._draw(self.num_samples, self.generator).tolist())
 
     def __len__(self):
         return self.num_samples
+
+
+class DistributedImbalancedDatasetSampler(ImbalancedDatasetSampler):
+    """Distributed version of `ImbalancedDatasetSampler`, every replica gets its own shard of an epoch.
+
+    All the replicas share the same weighted sequence of an epoch, seeded by `seed` and the epoch.
+    The sequence is split into blocks with independent seeds, so a replica generates only the blocks of its shard.
+    Call `set_epoch` before every epoch, like with `DistributedSampler`.
+    `state_dict` and `load_state_dict` resume an epoch from the sample it was stopped at. With `DataLoader`
+    workers or prefetching the sampler runs ahead of the training, so pass the number of processed samples
+    to `state_dict`.
+
+    Arguments:
+        num_replicas (int, optional): number of replicas, the world size by default
+        rank (int, optional): rank of the current replica, the current rank by default
+        seed (int): seed shared by all the replicas
+        num_samples (int, optional): number of samples to draw per epoch by all the replicas together
+    """
+
+    block_size = 2 ** 16
+
+    def __init__(self, dataset, num_replicas=None, rank=None, seed=0, indices=None, num_samples=None,
+                 callback_get_label=None):
+        super().__init__(dataset, indices=indices, num_samples=num_samples, callback_get_label=callback_get_label)
+
+        if num_replicas is None or rank is None:
+            import torch.distributed as dist
+
+            if not dist.is_available() or not dist.is_initialized():
+                raise RuntimeError("Requires distributed package to be initialized or `num_replicas` and `rank`")
+
+            num_replicas = dist.get_world_size() if num_replicas is None else num_replicas
+            rank = dist.get_rank() if rank is None else rank
+
+        if not 0 <= rank < num_replicas:
+            raise ValueError(f"Invalid rank {rank}, rank should be in the interval [0, {num_replicas - 1}]")
+
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.seed = seed
+        self.epoch = 0
+
+        # the same number of samples for every replica
+        self.num_samples = -(-self.num_samples // num_replicas)
+        self.total_size = self.num_samples * num_replicas
+
+        # samples of the current epoch already drawn by this replica, and the ones skipped on resume
+        self.consumed = 0
+        self._start = 0
+
+    def set_epoch(self, epoch):
+        # Setting the epoch a resumed state is in keeps its position
+        if epoch != self.epoch:
+            self.epoch = epoch
+            self.consumed = self._start = 0
+
+    def state_dict(self, processed=None):
+        """Returns the position in the epoch.
+
+        Arguments:
+            processed (int, optional): number of samples the replica has processed since the iteration has started,
+                e.g. batches times the batch size. All the samples drawn so far by default
+        """
+
+        consumed = self.consumed if processed is None else self._start + processed
+        return {'epoch': self.epoch, 'seed': self.seed, 'consumed': consumed}
+
+    def load_state_dict(self, state):
+        self.epoch = state['epoch']
+        self.seed = state['seed']
+        self.consumed = self._start = state['consumed']
+
+    def __len__(self):
+        """Number of samples of the epoch of this replica, fewer than `num_samples` once resumed.
+
+        It stays the same while the epoch is iterated.
+        """
+
+        return self.num_samples - self._start
+
+    def _block(self, block):
+        seed = np.random.SeedSequence((self.seed, self.epoch, block)).generate_state(2, dtype=np.uint32)
+        generator = torch.Generator().manual_seed(int(seed[0]) << 32 | int(seed[1]))
+        return self._draw(self.block_size, generator)
+
+    def __iter__(self):
+        self._start = self.consumed
+        start = self.rank * self.num_samples + self.consumed
+        stop = (self.rank + 1) * self.num_samples
+
+        for block in range(start // self.block_size, -(-stop // self.block_size)):
+            offset = block * self.block_size
+            indices = self._block(block)[max(start - offset, 0):stop - offset].tolist()
+
+            for idx in indices:
+                self.consumed += 1
+                yield idx
+
+        # the epoch is over, the next one starts over unless the epoch is set explicitly
+        self.consumed = self._start = 0
@@ -0,0 +1,185 @@
+import logging
+import mmap
+
+import numpy as np
+
+from pathlib import Path
+from typing import (
+    Callable,
+    Optional,
+    Union,
+)
+
+from torch.utils.data import Dataset
+
+from .datasets import BaseDataset, _compact_targets, _get_unified_transform
+
+log = logging.getLogger(__name__)
+
+_ALIGNMENT = 64
+
+__all__ = ["PackedDataset", "pack_dataset"]
+
+
+def _shard_path(prefix: Path, shard: int) -> Path:
+    return prefix.with_name(f"{prefix.name}-{shard:05d}.bin")
+
+
+def _index_path(prefix: Path) -> Path:
+    return prefix.with_name(f"{prefix.name}.index.npz")
+
+
+def pack_dataset(dataset: BaseDataset, prefix: Union[str, Path], shard_bytes: int = 2 ** 32) -> Path:
+    """Packs decoded samples of a dataset into contiguous shards plus an offset index, see `PackedDataset`.
+
+    Samples are stored as `BaseDataset.load_sample` returns them, e.g. as uint8 images for `ImageDataset`.
+
+    Args:
+        dataset (BaseDataset): Dataset to pack
+        prefix (str, Path): Path prefix of the packed files, e.g. `data/train` for `data/train.index.npz`
+            and `data/train-00000.bin`
+        shard_bytes (int): Size a shard is closed at, the last sample may go beyond it
+
+    Returns:
+        Path: Path of the index file
+    """
+
+    count = len(dataset)
+    if not count:
+        error = "Can't pack an empty dataset"
+        log.error(error)
+        raise ValueError(error)
+
+    # Index is loaded without pickle, so targets need a fixed-size dtype, e.g. strings become unicode
+    targets = _compact_targets(np.asarray(dataset.targets))
+    if targets.dtype == object:
+        error = f"Can't pack targets of mixed or variable-size types, e.g. `{type(targets[0]).__name__}`"
+        log.error(error)
+        raise ValueError(error)
+
+    prefix = Path(prefix)
+    prefix.parent.mkdir(parents=True, exist_ok=True)
+
+    shards = np.zeros(count, dtype=np.int32)
+    offsets = np.zeros(count, dtype=np.int64)
+    ndims = np.zeros(count, dtype=np.int8)
+    shapes = list()
+    dtypes = list()
+    dtype_codes = np.zeros(count, dtype=np.int8)
+
+    shard, offset = 0, 0
+    file = open(_shard_path(prefix, shard), 'wb')
+    try:
+        for idx in range(count):
+            path, _ = dataset.samples[idx]
+            sample = np.ascontiguousarray(dataset.load_sample(path))
+
+            if offset >= shard_bytes:
+                file.close()
+                shard, offset = shard + 1, 0
+                file = open(_shard_path(prefix, shard), 'wb')
+
+            # Aligned samples keep vectorized reads of every sample aligned as well
+            padding = -offset % _ALIGNMENT
+            file.write(b'\0' * padding)
+            offset += padding
+
+            if sample.dtype.str not in dtypes:
+                dtypes.append(sample.dtype.str)
+
+            shards[idx] = shard
+            offsets[idx] = offset
+            ndims[idx] = sample.ndim
+            shapes.append(sample.shape)
+            dtype_codes[idx] = dtypes.index(sample.dtype.str)
+
+            file.write(sample.data)
+            offset += sample.nbytes
+    finally:
+        file.close()
+
+    padded = np.zeros((count, max(ndims)), dtype=np.int64)
+    for idx, shape in enumerate(shapes):
+        padded[idx, :len(shape)] = shape
+
+    index_path = _index_path(prefix)
+    np.savez(index_path,
+             shards=shards,
+             offsets=offsets,
+             ndims=ndims,
+             shapes=padded,
+             dtype_codes=dtype_codes,
+             dtypes=np.array(dtypes),
+             targets=targets)
+
+    log.info(f"Packed {count} samples into {shard + 1} shard(s) at `{prefix}`.")
+    return index_path
+
+
+class PackedDataset(Dataset):
+    """Dataset over the shards written by `pack_dataset`, read through `mmap`.
+
+    Samples are zero-copy read-only views of the mapped shards, so reading an epoch in order is sequential I/O.
+    Only the index is loaded into memory, as compact NumPy arrays.
+
+    Args:
+        prefix (str, Path): Path prefix the dataset was packed with
+        transform (Callable, optional): Transform applied to every sample
+        copy (bool): Whether to return writable copies instead of views, for transforms working in place
+    """
+
+    def __init__(self,
+                 prefix: Union[str, Path],
+                 transform: Optional[Callable] = None,
+                 copy: bool = False):
+
+        super().__init__()
+
+        self.prefix = Path(prefix)
+        self.transform = _get_unified_transform(transform)
+        self.copy = copy
+
+        with np.load(_index_path(self.prefix)) as index:
+            self.shards = index['shards']
+            self.offsets = index['offsets']
+            self.ndims = index['ndims']
+            self.shapes = index['shapes']
+            self.dtype_codes = index['dtype_codes']
+            self.dtypes = [np.dtype(dtype) for dtype in index['dtypes']]
+            self.targets = index['targets']
+
+        self._maps = dict()
+
+    def _map(self, shard: int) -> mmap.mmap:
+        # Mapped lazily, so that every worker maps the shards itself
+        if shard not in self._maps:
+            with open(_shard_path(self.prefix, shard), 'rb') as file:
+                self._maps[shard] = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return self._maps[shard]
+
+    def __len__(self):
+        return len(self.targets)
+
+    def __getitem__(self, idx):
+        shape = tuple(self.shapes[idx, :self.ndims[idx]])
+        dtype = self.dtypes[self.dtype_codes[idx]]
+        count = int(np.prod(shape, dtype=np.int64))
+
+        sample = np.frombuffer(self._map(int(self.shards[idx])),
+                               dtype=dtype,
+                               count=count,
+                               offset=int(self.offsets[idx])).reshape(shape)
+
+        if self.copy:
+            sample = sample.copy()
+
+        if self.transform:
+            sample = self.transform(sample)
+
+        return sample, self.targets[idx]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_maps'] = dict()
+        return state
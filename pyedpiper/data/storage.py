@@ -0,0 +1,325 @@
+import asyncio
+import logging
+import os
+import posixpath
+import threading
+import xml.etree.ElementTree as ElementTree
+
+from abc import ABCMeta
+from abc import abstractmethod
+from pathlib import Path
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+from urllib.parse import quote, urlencode, urlsplit
+
+log = logging.getLogger(__name__)
+
+_DEFAULT_CACHE_DIR = Path("~/.cache/pyedpiper/objects")
+
+__all__ = ["ObjectStorage", "Storage"]
+
+
+class Storage(metaclass=ABCMeta):
+    """Source of dataset files other than the local filesystem, see `BaseDataset`.
+
+    Files are addressed by keys, which are fetched into local files the dataset loaders can read.
+    """
+
+    @abstractmethod
+    def list(self, prefix: str, extensions: Iterable[str], recursive: bool = False) -> List[str]:
+        """Returns sorted keys under the prefix with the given extensions."""
+
+    @abstractmethod
+    def fetch(self, key: str) -> Path:
+        """Returns a local path with the contents of the key."""
+
+    def fetch_many(self, keys: Iterable[str]) -> List[Path]:
+        return [self.fetch(key) for key in keys]
+
+
+class _ConnectionPool:
+    """Keep-alive HTTP connections to a single host."""
+
+    def __init__(self, host: str, port: int, ssl: bool, max_connections: int):
+        self.host = host
+        self.port = port
+        self.ssl = ssl
+        self._idle = list()
+        self._slots = asyncio.Semaphore(max_connections)
+
+    async def acquire(self):
+        await self._slots.acquire()
+        try:
+            while self._idle:
+                reader, writer = self._idle.pop()
+                if not reader.at_eof() and not writer.is_closing():
+                    return reader, writer
+                writer.close()
+
+            return await asyncio.open_connection(self.host, self.port, ssl=self.ssl or None)
+
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection, reusable: bool):
+        if reusable:
+            self._idle.append(connection)
+        else:
+            connection[1].close()
+        self._slots.release()
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+class ObjectStorage(Storage):
+    """S3-compatible object store read with asyncio over pooled keep-alive connections.
+
+    Objects are fetched into a local read-through cache once and assumed to never change afterwards.
+    The event loop runs in a background thread of every process using the storage.
+
+    Args:
+        endpoint (str): Endpoint URL, e.g. `http://localhost:9000`
+        bucket (str): Bucket name, objects are addressed path-style as `/{bucket}/{key}`
+        cache_dir (str, Path, optional): Directory of the local cache, a per-bucket one in `~/.cache` by default
+        max_concurrency (int): Maximum number of requests in flight
+        headers (dict, optional): Headers sent with every request, e.g. static authorization
+        sign (Callable, optional): Called with the method, target and headers of every request
+            to add authentication headers, e.g. AWS signature
+    """
+
+    def __init__(self,
+                 endpoint: str,
+                 bucket: str,
+                 cache_dir: Optional[Union[str, Path]] = None,
+                 max_concurrency: int = 16,
+                 headers: Optional[Dict[str, str]] = None,
+                 sign: Optional[Callable[[str, str, Dict[str, str]], Dict[str, str]]] = None):
+
+        url = urlsplit(endpoint)
+        if url.scheme not in ('http', 'https'):
+            error = f"Expected an `http` or `https` endpoint, got `{endpoint}`"
+            log.error(error)
+            raise ValueError(error)
+
+        self.endpoint = endpoint
+        self.bucket = bucket
+        self.max_concurrency = max_concurrency
+        self.headers = dict(headers or {})
+        self.sign = sign
+
+        self._ssl = url.scheme == 'https'
+        self._host = url.hostname
+        self._port = url.port or (443 if self._ssl else 80)
+
+        if cache_dir is None:
+            cache_dir = _DEFAULT_CACHE_DIR / f"{self._host}_{self._port}" / bucket
+        self.cache_dir = Path(cache_dir).expanduser()
+
+        self._loop = None
+        self._loop_pid = None
+        self._lock = threading.Lock()
+        self._pool = None
+        self._inflight = dict()
+
+    def _run(self, coroutine):
+        # The loop thread doesn't survive a fork, so every process starts its own
+        with self._lock:
+            if self._loop is None or self._loop_pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._loop_pid = os.getpid()
+                self._pool = None
+                self._inflight = dict()
+                threading.Thread(target=self._loop.run_forever, name='pyedpiper-storage', daemon=True).start()
+
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def _get_pool(self) -> _ConnectionPool:
+        if self._pool is None:
+            self._pool = _ConnectionPool(self._host, self._port, self._ssl, self.max_concurrency)
+        return self._pool
+
+    async def _request(self, target: str) -> Tuple[int, bytes]:
+        headers = {'Host': f"{self._host}:{self._port}", **self.headers}
+        if self.sign is not None:
+            headers = self.sign('GET', target, headers)
+
+        request = f"GET {target} HTTP/1.1\r\n"
+        request += ''.join(f"{name}: {value}\r\n" for name, value in headers.items())
+        request = (request + "\r\n").encode('latin-1')
+
+        pool = self._get_pool()
+
+        # The server may have closed an idle connection meanwhile, which shows up on the first read
+        for attempt in range(2):
+            connection = await pool.acquire()
+            try:
+                status, body, reusable = await self._exchange(connection, request)
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                pool.release(connection, reusable=False)
+                if attempt:
+                    raise OSError(f"Request `{target}` to `{self.endpoint}` failed: {e}") from e
+                continue
+            except BaseException:
+                pool.release(connection, reusable=False)
+                raise
+
+            pool.release(connection, reusable)
+            return status, body
+
+    @staticmethod
+    async def _exchange(connection, request: bytes) -> Tuple[int, bytes, bool]:
+        reader, writer = connection
+        writer.write(request)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise asyncio.IncompleteReadError(b'', None)
+        status = int(status_line.split()[1])
+
+        headers = dict()
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        reusable = headers.get('connection', '').lower() != 'close'
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = list()
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            body = await reader.read()
+            reusable = False
+
+        return status, body, reusable
+
+    def _check(self, status: int, target: str, body: bytes, expected: Iterable[int]):
+        # Anything else, e.g. a partial content or a redirect, doesn't carry the complete object
+        if status not in expected:
+            error = f"Request `{target}` to `{self.endpoint}` failed with status {status}: {body[:200]!r}"
+            log.error(error)
+            raise OSError(error)
+
+    @staticmethod
+    def _normalize(key: str) -> str:
+        key = posixpath.normpath(str(key)).lstrip('/')
+        return '' if key == '.' else key
+
+    async def _list(self, prefix: str, suffixes: Tuple[str, ...], recursive: bool) -> List[str]:
+        prefix = self._normalize(prefix)
+        prefix = prefix + '/' if prefix else prefix
+
+        keys = list()
+        query = {'list-type': '2', 'prefix': prefix}
+        if not recursive:
+            query['delimiter'] = '/'
+
+        while True:
+            target = f"/{quote(self.bucket)}?{urlencode(sorted(query.items()))}"
+            status, body = await self._request(target)
+            self._check(status, target, body, expected=range(200, 300))
+
+            # Tags are namespaced by S3 and not by some of the compatible stores
+            elements = list(ElementTree.fromstring(body))
+            result = {element.tag.rsplit('}', 1)[-1]: element for element in elements}
+            for element in elements:
+                if element.tag.endswith('Contents'):
+                    key = next(child.text for child in element if child.tag.endswith('Key'))
+                    if key.endswith(suffixes):
+                        keys.append(key)
+
+            truncated = result.get('IsTruncated')
+            if truncated is None or truncated.text != 'true':
+                break
+            query['continuation-token'] = result['NextContinuationToken'].text
+
+        return sorted(keys)
+
+    def list(self, prefix, extensions, recursive=False):
+        suffixes = tuple('.' + ext.lstrip('.') for ext in extensions)
+        return self._run(self._list(prefix, suffixes, recursive))
+
+    def _local_path(self, key: str) -> Path:
+        # Keys are normalized already, so only leading parent references are left to escape the cache
+        parts = Path(key).parts
+        if not parts or '..' in parts or Path(key).anchor:
+            error = f"Can't cache key `{key}` outside of `{self.cache_dir}`"
+            log.error(error)
+            raise ValueError(error)
+
+        return self.cache_dir / key
+
+    async def _download(self, key: str) -> Path:
+        path = self._local_path(key)
+        target = f"/{quote(self.bucket)}/{quote(key)}"
+
+        status, body = await self._request(target)
+        self._check(status, target, body, expected=(200,))
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        temporary.write_bytes(body)
+
+        # Other workers sharing the cache see either no file or the complete one
+        os.replace(temporary, path)
+        return path
+
+    async def _fetch(self, key: str) -> Path:
+        # Requests for the same key share a single download
+        if key not in self._inflight:
+            self._inflight[key] = asyncio.ensure_future(self._download(key))
+        try:
+            return await asyncio.shield(self._inflight[key])
+        finally:
+            task = self._inflight.get(key)
+            if task is not None and task.done():
+                del self._inflight[key]
+
+    async def _fetch_many(self, keys: List[str]) -> List[Path]:
+        return list(await asyncio.gather(*(self._fetch(key) for key in keys)))
+
+    def fetch(self, key):
+        key = self._normalize(key)
+        path = self._local_path(key)
+        if path.exists():
+            return path
+        return self._run(self._fetch(key))
+
+    def fetch_many(self, keys):
+        keys = [self._normalize(key) for key in keys]
+        missing = [key for key in dict.fromkeys(keys) if not self._local_path(key).exists()]
+        if missing:
+            self._run(self._fetch_many(missing))
+        return [self._local_path(key) for key in keys]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(_loop=None, _loop_pid=None, _lock=None, _pool=None, _inflight=dict())
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
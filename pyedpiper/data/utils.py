@@ -1,27 +1,125 @@
+import importlib.util
 import logging
 import numpy as np
 
-from matplotlib import pyplot as plt
+from collections import OrderedDict
+from functools import partial
 from os.path import basename
-from PIL import Image
-from typing import Callable
+from typing import (
+    Callable,
+    List,
+)
 
 from ..core.common import as_numpy
 
 log = logging.getLogger(__name__)
 
 
-def get_class_weights(targets, use_max=True):
-    # todo: add a docstring
-    targets = as_numpy(targets)
-    class_sample_count = np.array([len(np.where(targets == t)[0]) for t in np.unique(targets)])
+def _count_classes(targets):
+    """Returns sorted classes and their counts, with `bincount` for dense non-negative integer labels."""
+
+    import torch
+
+    if isinstance(targets, torch.Tensor):
+        targets = targets.reshape(-1)
+        if targets.numel() and not targets.is_floating_point() and targets.dtype != torch.bool:
+            low, high = targets.min().item(), targets.max().item()
+            if low >= 0 and high <= 2 * targets.numel() + 2 ** 16:
+                counts = torch.bincount(targets, minlength=high + 1)
+                classes = counts.nonzero().squeeze(1)
+                return classes, counts[classes]
+        return torch.unique(targets, return_counts=True)
+
+    targets = as_numpy(targets).reshape(-1)
+    if targets.size and targets.dtype.kind in 'iu':
+        low, high = targets.min(), targets.max()
+        if low >= 0 and high <= 2 * targets.size + 2 ** 16:
+            counts = np.bincount(targets)
+            classes = counts.nonzero()[0]
+            return classes, counts[classes]
+    return np.unique(targets, return_counts=True)
+
+
+def _is_chunk(item) -> bool:
+    """Array-likes are chunks of labels, anything else (including 0-dim arrays and tensors) is a single label."""
+
+    return isinstance(item, (list, tuple)) or getattr(item, 'ndim', 0) > 0
+
+
+def _iter_chunks(items, batch_size=2 ** 16):
+    """Yields the chunks of an iterable as they are and batches of the single labels in between."""
+
+    labels = list()
+    for item in items:
+        if _is_chunk(item):
+            yield item
+            continue
+
+        labels.append(item.item() if hasattr(item, 'item') else item)
+        if len(labels) == batch_size:
+            yield labels
+            labels = list()
+
+    if labels:
+        yield labels
+
+
+def _count_chunks(chunks):
+    totals = dict()
+    for chunk in chunks:
+        classes, counts = _count_classes(chunk)
+        classes = as_numpy(classes).tolist()
+        for cls, count in zip(classes, as_numpy(counts).tolist()):
+            totals[cls] = totals.get(cls, 0) + count
+
+    if not totals:
+        error = "Can't compute class weights without targets"
+        log.error(error)
+        raise ValueError(error)
+
+    return np.array([totals[cls] for cls in sorted(totals)])
+
+
+def get_class_weights(targets, use_max=True, beta=None):
+    """Computes weights of classes inversely proportional to their frequencies in a single O(N) pass.
+
+    Args:
+        targets: Labels as an array or a tensor, or an iterable of labels and chunks of labels,
+            e.g. a `range`, batches of targets from a `DataLoader` of uneven size
+            or columns of `pandas.read_csv(..., chunksize=...)` chunks
+        use_max (bool): Whether to scale the weights so that the most common class weighs 1
+        beta (float, optional): Uses the inverse effective number of samples `(1 - beta) / (1 - beta ** count)`
+            instead of the inverse count, see "Class-Balanced Loss Based on Effective Number of Samples"
+
+    Returns:
+        Weights of the classes in the sorted order of the classes: a tensor on the same device for tensor targets,
+        an array otherwise
+    """
+
+    import torch
+
+    if isinstance(targets, torch.Tensor):
+        _, counts = _count_classes(targets)
+        counts = counts.double()
+        weights = 1. / counts if beta is None else (1. - beta) / (1. - torch.pow(beta, counts))
+        if use_max:
+            weights = weights / weights[counts.argmax()]
+        return weights.to(torch.get_default_dtype())
+
+    if hasattr(targets, '__array__'):
+        _, counts = _count_classes(targets)
+    else:
+        # Lists may be ragged, so every item is either a label or a chunk of them
+        counts = _count_chunks(_iter_chunks(targets))
+
+    counts = counts.astype(np.float64)
+    weights = 1. / counts if beta is None else (1. - beta) / (1. - np.power(beta, counts))
 
     if use_max:
         # (number of occurrences in most common class) / (number of occurrences in rare classes)
-        max_class_count = np.max(class_sample_count)
-        return max_class_count / class_sample_count
+        weights = weights / weights[counts.argmax()]
 
-    return 1. / class_sample_count
+    return weights
 
 
 def file_loader(function: Callable) -> Callable:
@@ -52,9 +150,153 @@ def numpy_loader(path):
 
 @file_loader
 def plt_loader(path):
+    from matplotlib import pyplot as plt
     return plt.imread(str(path))
 
 
 @file_loader
 def pil_loader(path):
+    from PIL import Image
     return Image.open(str(path))
+
+
+_DECODERS = OrderedDict()
+
+# Preference order of the `auto` decoder
+_AUTO_DECODERS = ('opencv', 'pil')
+
+_PIL_CONVERTED_MODES = {'P': 'RGBA', 'PA': 'RGBA', 'CMYK': 'RGB', 'YCbCr': 'RGB', '1': 'L'}
+
+
+def register_decoder(name: str, requires: str = None) -> Callable:
+    """Decorator registering an image decoder, see `get_decoder`.
+
+    Decoders take a path plus keyword options and return an image as a uint8 (or uint16) array.
+
+    Args:
+        name (str): Name to get the decoder by
+        requires (str, optional): Module the decoder depends on, it's unavailable if the module isn't installed
+
+    Returns:
+        Callable: decorator
+    """
+
+    def decorator(function: Callable) -> Callable:
+        loader = file_loader(function)
+        _DECODERS[name] = (loader, requires)
+        return loader
+
+    return decorator
+
+
+def available_decoders() -> List[str]:
+    return [name for name, (_, requires) in _DECODERS.items()
+            if requires is None or importlib.util.find_spec(requires) is not None]
+
+
+def get_decoder(name: str = 'auto', **options) -> Callable:
+    """Returns a loader decoding images with the registered decoder.
+
+    Args:
+        name (str): Name of the decoder, `auto` picks the fastest one installed
+        **options: Options bound to the decoder, e.g. `reduce=2`
+
+    Returns:
+        Callable: picklable loader taking a path
+    """
+
+    available = available_decoders()
+
+    if name == 'auto':
+        name = next(decoder for decoder in _AUTO_DECODERS if decoder in available)
+
+    if name not in _DECODERS:
+        error = f"Unknown decoder `{name}`. Use one of: {list(_DECODERS)}"
+        log.error(error)
+        raise KeyError(error)
+
+    if name not in available:
+        error = f"Decoder `{name}` requires `{_DECODERS[name][1]}` to be installed."
+        log.error(error)
+        raise ImportError(error)
+
+    decoder, _ = _DECODERS[name]
+    return partial(decoder, **options) if options else decoder
+
+
+def _check_reduce(reduce: int):
+    if reduce not in (1, 2, 4, 8):
+        raise ValueError(f"Expected `reduce` to be one of 1, 2, 4, 8, got {reduce}")
+
+
+@register_decoder('pil')
+def pil_decoder(path, reduce: int = 1):
+    """Decodes with PIL, JPEGs are decoded `reduce` times smaller right away with `Image.draft`.
+
+    Other formats are decoded at full size and then reduced with a box filter.
+    """
+
+    from PIL import Image
+
+    _check_reduce(reduce)
+    with Image.open(str(path)) as image:
+        width, height = image.size
+        if reduce > 1:
+            image.draft(image.mode, (width // reduce, height // reduce))
+
+        if image.mode in _PIL_CONVERTED_MODES:
+            image = image.convert(_PIL_CONVERTED_MODES[image.mode])
+
+        if reduce > 1 and image.size == (width, height):
+            image = image.reduce(reduce)
+
+        # Arrays over PIL images are read-only, transforms working in place expect a writable one
+        return np.array(image)
+
+
+@register_decoder('opencv', requires='cv2')
+def opencv_decoder(path, reduce: int = 1):
+    """Decodes with OpenCV into gray, RGB or RGBA as stored, `reduce` makes JPEGs decode to a smaller size.
+
+    Other formats are decoded at full size and then reduced with `INTER_AREA`, so the channels never depend on `reduce`.
+    """
+
+    import cv2
+
+    _check_reduce(reduce)
+    data = np.fromfile(str(path), dtype=np.uint8)
+
+    image = None
+    if reduce > 1 and data[:2].tobytes() == b'\xff\xd8':
+        # JPEGs have no alpha, so reading any color keeps the channels of an unchanged read.
+        # Orientation is ignored, as unchanged reads do
+        flags = getattr(cv2, f'IMREAD_REDUCED_GRAYSCALE_{reduce}') | cv2.IMREAD_ANYCOLOR | cv2.IMREAD_ANYDEPTH
+        image = cv2.imdecode(data, flags | cv2.IMREAD_IGNORE_ORIENTATION)
+    elif data.size:
+        image = cv2.imdecode(data, cv2.IMREAD_UNCHANGED)
+        if image is not None and reduce > 1:
+            height, width = image.shape[:2]
+            image = cv2.resize(image, (-(-width // reduce), -(-height // reduce)), interpolation=cv2.INTER_AREA)
+
+    if image is None:
+        raise OSError(f"OpenCV can't decode `{path}`")
+
+    if image.ndim == 3 and image.shape[2] == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    if image.ndim == 3 and image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2RGBA)
+    return image
+
+
+@register_decoder('torchvision', requires='torchvision')
+def torchvision_decoder(path, as_tensor: bool = False):
+    """Decodes with `torchvision.io`, either into a (C, H, W) uint8 tensor or into a (H, W, C) array view of it."""
+
+    from torchvision.io import ImageReadMode, decode_image, read_file
+
+    image = decode_image(read_file(str(path)), mode=ImageReadMode.UNCHANGED)
+    if as_tensor:
+        return image
+
+    image = image.permute(1, 2, 0).numpy()
+    return image[..., 0] if image.shape[2] == 1 else image
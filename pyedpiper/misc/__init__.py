@@ -1,5 +1,16 @@
-from .random_name import get_random_name
-from .tqdm_handler import TQDMHandler
+from ..core.lazy import attach
+
+__getattr__, __dir__ = attach(
+    __name__,
+    submodules=[
+        "random_name",
+        "tqdm_handler",
+    ],
+    attributes={
+        "get_random_name": ".random_name",
+        "TQDMHandler": ".tqdm_handler",
+    },
+)
 
 __all__ = [
     "get_random_name",
@@ -1,22 +1,48 @@
-from .common import (
-    Concat,
-    Lambda,
-    Positional,
-)
-from .extractor import (
-    Extractor
-)
-from .loss import (
-    BinaryFocalLoss,
-    CauchyLoss,
-    FocalLoss,
-    OHEMNLLLoss,
-    SmoothCrossEntropyLoss,
-    WingLoss,
-)
-from .pooling import (
-    GlobalAvgMeanStdStackPool2d,
-    GlobalMixStackPool2d,
-    GlobalAvgPool2d,
-    GlobalMaxPool2d,
+from ..core.lazy import attach
+
+__getattr__, __dir__ = attach(
+    __name__,
+    submodules=[
+        "common",
+        "extractor",
+        "loss",
+        "pooling",
+    ],
+    attributes={
+        "Concat": ".common",
+        "Lambda": ".common",
+        "Positional": ".common",
+        "Extractor": ".extractor",
+        "BinaryFocalLoss": ".loss",
+        "CauchyLoss": ".loss",
+        "ChunkedSmoothCrossEntropyLoss": ".loss",
+        "CompositeLoss": ".loss",
+        "FocalLoss": ".loss",
+        "OHEMNLLLoss": ".loss",
+        "SmoothCrossEntropyLoss": ".loss",
+        "WingLoss": ".loss",
+        "GlobalAvgMeanStdStackPool2d": ".pooling",
+        "GlobalMixStackPool2d": ".pooling",
+        "GlobalAvgPool2d": ".pooling",
+        "GlobalMaxPool2d": ".pooling",
+    },
 )
+
+__all__ = [
+    "Concat",
+    "Lambda",
+    "Positional",
+    "Extractor",
+    "BinaryFocalLoss",
+    "CauchyLoss",
+    "ChunkedSmoothCrossEntropyLoss",
+    "CompositeLoss",
+    "FocalLoss",
+    "OHEMNLLLoss",
+    "SmoothCrossEntropyLoss",
+    "WingLoss",
+    "GlobalAvgMeanStdStackPool2d",
+    "GlobalMixStackPool2d",
+    "GlobalAvgPool2d",
+    "GlobalMaxPool2d",
+]
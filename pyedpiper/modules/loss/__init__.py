@@ -1,6 +1,8 @@
 from .cauchy import *
+from .composite import *
 from .focal import *
 from .functional import *
 from .ohem_nll import *
+from .reduction import *
 from .smooth import *
 from .wing import *
@@ -1,5 +1,3 @@
-import torch
-
 from .functional import cauchy_loss
 from .loss import Loss
 
@@ -15,12 +13,4 @@ class CauchyLoss(Loss):
         self.ignore_index = ignore_index
 
     def forward(self, input, target):
-        if self.ignore_index is not None:
-            mask = target != self.ignore_index
-            target = target[mask]
-            input = input[mask]
-
-        if not len(target):
-            return torch.tensor(0.).to(input.device)
-
-        return cauchy_loss(input, target.float(), self.c, self.reduction)
+        return cauchy_loss(input, target.float(), self.c, self.reduction, self.ignore_index)
@@ -0,0 +1,82 @@
+from typing import (
+    Dict,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+import torch.nn.functional as F
+from torch import nn, Tensor
+
+from .functional import one_hot_like
+
+__all__ = ["CompositeLoss", "LossIntermediates"]
+
+
+class LossIntermediates:
+    """Lazily computed values shared by several losses over the same logits and targets.
+
+    Losses that support sharing implement `forward_shared(intermediates)`.
+    """
+
+    def __init__(self, input: Tensor, target: Tensor):
+        self.input = input
+        self.target = target
+        self._log_probs = dict()
+        self._probs = dict()
+        self._one_hot = None
+
+    def log_probs(self, dim: int = 1) -> Tensor:
+        if dim not in self._log_probs:
+            self._log_probs[dim] = F.log_softmax(self.input, dim=dim)
+        return self._log_probs[dim]
+
+    def probs(self, dim: int = 1) -> Tensor:
+        if dim not in self._probs:
+            self._probs[dim] = self.log_probs(dim).exp()
+        return self._probs[dim]
+
+    @property
+    def one_hot(self) -> Tensor:
+        if self._one_hot is None:
+            self._one_hot = one_hot_like(self.target, self.input)
+        return self._one_hot
+
+
+class CompositeLoss(nn.Module):
+    """Weighted sum of losses over the same logits and targets.
+
+    Intermediate values like log-probabilities or one-hot targets are computed once per forward
+    for all the losses that support it, see `LossIntermediates`. Others are simply called.
+
+    :param losses: Mapping of a term name to the loss module.
+    :param weights: Mapping of a term name to its weight, 1 by default.
+    """
+
+    def __init__(self, losses: Mapping[str, nn.Module], weights: Optional[Mapping[str, float]] = None):
+        super().__init__()
+        self.losses = nn.ModuleDict(losses)
+        self.weights = {name: 1.0 for name in self.losses}
+
+        if weights:
+            unknown = set(weights).difference(self.losses)
+            assert not unknown, "Weights are given for unknown losses: {}".format(', '.join(sorted(unknown)))
+            self.weights.update(weights)
+
+    def forward(self, input: Tensor, target: Tensor) -> Tuple[Tensor, Dict[str, Tensor]]:
+        """Returns the weighted total along with unweighted values of every term."""
+
+        intermediates = LossIntermediates(input, target)
+
+        total = 0
+        terms = dict()
+        for name, loss in self.losses.items():
+            if hasattr(loss, "forward_shared"):
+                value = loss.forward_shared(intermediates)
+            else:
+                value = loss(input, target)
+
+            terms[name] = value
+            total = total + self.weights[name] * value
+
+        return total, terms
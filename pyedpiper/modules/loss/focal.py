@@ -1,6 +1,6 @@
 from functools import partial
 
-from .functional import focal_loss_with_logits
+from .functional import focal_loss_with_logits, multiclass_focal_loss_with_logits
 from .loss import Loss
 
 __all__ = ["BinaryFocalLoss", "FocalLoss"]
@@ -32,6 +32,7 @@ class BinaryFocalLoss(Loss):
             reduced_threshold=reduced_threshold,
             reduction=reduction,
             normalized=normalized,
+            ignore_index=ignore_index,
         )
 
     def forward(self, input, target):
@@ -40,12 +41,6 @@ class BinaryFocalLoss(Loss):
         target = target.view(-1)
         input = input.view(-1)
 
-        if self.ignore_index is not None:
-            # Filter predictions with ignore label from loss computation
-            not_ignored = target != self.ignore_index
-            input = input[not_ignored]
-            target = target[not_ignored]
-
         loss = self.focal_loss_fn(input, target)
         return loss
 
@@ -70,30 +65,17 @@ class FocalLoss(Loss):
         super().__init__()
         self.ignore_index = ignore_index
         self.focal_loss_fn = partial(
-            focal_loss_with_logits,
+            multiclass_focal_loss_with_logits,
             alpha=alpha,
             gamma=gamma,
             reduced_threshold=reduced_threshold,
             reduction=reduction,
             normalized=normalized,
+            ignore_index=ignore_index,
         )
 
     def forward(self, input, target):
-        num_classes = input.size(1)
-        loss = 0
-
-        # Filter anchors with -1 label from loss computation
-        if self.ignore_index is not None:
-            not_ignored = target != self.ignore_index
-
-        for cls in range(num_classes):
-            cls_label_target = (target == cls).long()
-            cls_label_input = input[:, cls, ...]
+        return self.focal_loss_fn(input, target)
 
-            if self.ignore_index is not None:
-                cls_label_target = cls_label_target[not_ignored]
-                cls_label_input = cls_label_input[not_ignored]
-
-            loss += self.focal_loss_fn(cls_label_input, cls_label_target)
-
-        return loss
+    def forward_shared(self, intermediates):
+        return self.focal_loss_fn(intermediates.input, intermediates.target, one_hot=intermediates.one_hot)
@@ -1,12 +1,25 @@
 # TODO: read arxiv papers related to each loss and finish up the docstrings accordingly
 
 import math
+from functools import lru_cache
 from typing import Optional
 
 import torch
-import torch.functional as F
+import torch.nn.functional as F
+from torch.autograd.function import once_differentiable
 
-__all__ = ["focal_loss_with_logits", "cauchy_loss", "wing_loss", "label_smoothed_nll_loss"]
+from .reduction import masked_reduce
+
+__all__ = [
+    "focal_loss_with_logits",
+    "multiclass_focal_loss_with_logits",
+    "cauchy_loss",
+    "wing_loss",
+    "wing_loss_constant",
+    "label_smoothed_nll_loss",
+    "chunked_label_smoothed_cross_entropy",
+    "one_hot_like",
+]
 
 
 def focal_loss_with_logits(input: torch.Tensor,
@@ -15,7 +28,8 @@ def focal_loss_with_logits(input: torch.Tensor,
                            alpha: Optional[float] = 0.25,
                            reduction="mean",
                            normalized=False,
-                           reduced_threshold: Optional[float] = None, ) -> torch.Tensor:
+                           reduced_threshold: Optional[float] = None,
+                           ignore_index: Optional[int] = None) -> torch.Tensor:
     """Compute binary focal loss between target and output logits.
 
     Source:
@@ -35,61 +49,226 @@ def focal_loss_with_logits(input: torch.Tensor,
             'batchwise_mean' computes mean loss per sample in batch. Default: 'mean'
         normalized (bool): Compute normalized focal loss (https://arxiv.org/pdf/1909.07829.pdf).
         reduced_threshold (float, optional): Compute reduced focal loss (https://arxiv.org/abs/1903.01347).
+        ignore_index (int, optional): Target value that doesn't contribute to the loss.
+            Ignored elements are zeroed, so 'none' reduction keeps the shape of the input.
     """
 
+    mask = None
+    if ignore_index is not None:
+        mask = target != ignore_index
+        target = target.masked_fill(~mask, 0)
+
     target = target.type(input.type())
+    loss, focal_term = _focal_loss_elementwise(input, target, gamma, alpha, reduced_threshold)
+
+    if normalized:
+        if mask is not None:
+            focal_term = focal_term.masked_fill(~mask, 0)
+        norm_factor = focal_term.sum() + 1e-5
+        loss = loss / norm_factor
+
+    return masked_reduce(loss, mask, reduction)
+
+
+def multiclass_focal_loss_with_logits(input: torch.Tensor,
+                                      target: torch.Tensor,
+                                      gamma: float = 2.0,
+                                      alpha: Optional[float] = None,
+                                      reduction="mean",
+                                      normalized=False,
+                                      reduced_threshold: Optional[float] = None,
+                                      ignore_index: Optional[int] = None,
+                                      one_hot: Optional[torch.Tensor] = None) -> torch.Tensor:
+    """Compute one-vs-all focal loss over the classes in a single pass.
+
+    Equals to the sum of `focal_loss_with_logits` over binary targets of every class,
+    i. e. normalization and 'mean' reduction are done per class.
+    Ignored targets are masked out rather than filtered, so 'none' and 'batchwise_mean' reductions
+    keep the shape of the target with zeros in place of the ignored elements.
+
+    Args:
+        input (_torch.Tensor): Tensor of shape (N, C, *) with logits
+        target (_torch.Tensor): Tensor of shape (N, *) with class indices
+        gamma (float):
+        alpha (float):
+        reduction (string, optional): 'none' | 'mean' | 'sum' | 'batchwise_mean', see `focal_loss_with_logits`
+        normalized (bool): Compute normalized focal loss (https://arxiv.org/pdf/1909.07829.pdf).
+        reduced_threshold (float, optional): Compute reduced focal loss (https://arxiv.org/abs/1903.01347).
+        ignore_index (int, optional): Target value that doesn't contribute to the loss.
+        one_hot (_torch.Tensor, optional): Precomputed `one_hot_like(target, input)`, e.g. shared with other losses.
+    """
+
+    if one_hot is None:
+        one_hot = one_hot_like(target, input)
+
+    loss, focal_term = _focal_loss_elementwise(input, one_hot, gamma, alpha, reduced_threshold)
+
+    mask = target != ignore_index if ignore_index is not None else None
+
+    if normalized:
+        if mask is not None:
+            focal_term = focal_term.masked_fill(~mask.unsqueeze(1), 0)
+
+        # Every class is normalized separately
+        dims = [dim for dim in range(input.dim()) if dim != 1]
+        loss = loss / (focal_term.sum(dims, keepdim=True) + 1e-5)
+
+    # Summing over the classes makes 'mean' the same as the sum of per class means
+    return masked_reduce(loss.sum(1), mask, reduction)
+
+
+def one_hot_like(target: torch.Tensor, input: torch.Tensor) -> torch.Tensor:
+    """Encodes class indices of shape (N, *) as the input of shape (N, C, *) with the same dtype.
+
+    Targets out of the classes range (e.g. ignored ones) don't belong to any class.
+    """
+
+    classes = torch.arange(input.size(1), device=input.device).view(1, -1, *([1] * (input.dim() - 2)))
+    return (target.unsqueeze(1) == classes).type_as(input)
+
+
+def _focal_loss_elementwise(input: torch.Tensor,
+                            target: torch.Tensor,
+                            gamma: float,
+                            alpha: Optional[float],
+                            reduced_threshold: Optional[float]):
+    """Returns unreduced focal loss along with its focal term."""
+
+    # Fused backward computes the gradient of the input only, learned soft targets go through autograd
+    if target.requires_grad:
+        return _focal_loss_autograd(input, target, gamma, alpha, reduced_threshold)
+
+    return _FocalLossFunction.apply(input, target, gamma, alpha, reduced_threshold)
+
+
+def _focal_loss_autograd(input: torch.Tensor,
+                         target: torch.Tensor,
+                         gamma: float,
+                         alpha: Optional[float],
+                         reduced_threshold: Optional[float]):
+    """Same as `_FocalLossFunction`, but built of out-of-place autograd ops."""
 
     logpt = F.binary_cross_entropy_with_logits(input, target, reduction="none")
     pt = torch.exp(-logpt)
 
-    # compute the loss
     if reduced_threshold is None:
         focal_term = (1 - pt).pow(gamma)
     else:
-        focal_term = ((1.0 - pt) / reduced_threshold).pow(gamma)
-        focal_term[pt < reduced_threshold] = 1
+        focal_term = ((1 - pt) / reduced_threshold).pow(gamma).masked_fill(pt < reduced_threshold, 1)
 
     loss = focal_term * logpt
+    if alpha is not None:
+        loss = loss * (target * alpha + (1 - target) * (1 - alpha))
+
+    return loss, focal_term
+
+
+def _focal_loss_terms(input: torch.Tensor,
+                      target: torch.Tensor,
+                      gamma: float,
+                      alpha: Optional[float],
+                      reduced_threshold: Optional[float]):
+    """Computes the pieces of focal loss reusing the buffers where possible."""
+
+    logpt = F.binary_cross_entropy_with_logits(input, target, reduction="none")
 
+    # Probability of the target, then its complement as a base of the focal term
+    base = torch.exp(-logpt)
+    pt = base.clone() if reduced_threshold is not None else None
+    base.neg_().add_(1)
+
+    if reduced_threshold is not None:
+        base.div_(reduced_threshold)
+
+    focal_term = base.pow(gamma)
+
+    if reduced_threshold is not None:
+        focal_term.masked_fill_(pt < reduced_threshold, 1)
+
+    weight = None
     if alpha is not None:
-        loss *= alpha * target + (1 - alpha) * (1 - target)
+        weight = target * alpha + (1 - target) * (1 - alpha)
 
-    if normalized:
-        norm_factor = focal_term.sum() + 1e-5
-        loss /= norm_factor
+    return logpt, base, pt, focal_term, weight
 
-    if reduction == "mean":
-        loss = loss.mean()
-    if reduction == "sum":
-        loss = loss.sum()
-    if reduction == "batchwise_mean":
-        loss = loss.sum(0)
 
-    return loss
+class _FocalLossFunction(torch.autograd.Function):
+    """Focal loss that keeps only the inputs for backward and recomputes everything else."""
+
+    @staticmethod
+    def forward(ctx, input, target, gamma, alpha, reduced_threshold):
+        logpt, _, _, focal_term, weight = _focal_loss_terms(input, target, gamma, alpha, reduced_threshold)
+
+        loss = logpt.mul_(focal_term)
+        if weight is not None:
+            loss.mul_(weight)
+
+        ctx.save_for_backward(input, target)
+        ctx.gamma = gamma
+        ctx.alpha = alpha
+        ctx.reduced_threshold = reduced_threshold
+
+        # Unused outputs get no gradient rather than zeros, torch<1.7 always passes zeros
+        if hasattr(ctx, 'set_materialize_grads'):
+            ctx.set_materialize_grads(False)
+
+        return loss, focal_term
+
+    @staticmethod
+    @once_differentiable
+    def backward(ctx, grad_loss, grad_focal_term):
+        input, target = ctx.saved_tensors
+        gamma, reduced_threshold = ctx.gamma, ctx.reduced_threshold
+
+        logpt, base, pt, focal_term, weight = _focal_loss_terms(input, target, gamma, ctx.alpha, reduced_threshold)
+
+        # Derivative of BCE with respect to the logits
+        dlogpt = torch.sigmoid(input).sub_(target)
+
+        # d(focal_term)/dx = gamma * base ^ (gamma - 1) * pt * dlogpt / threshold
+        if gamma == 0:
+            dfocal = torch.zeros_like(input)
+        else:
+            pt = torch.exp(-logpt) if pt is None else pt
+            dfocal = base.pow_(gamma - 1).mul_(pt).mul_(dlogpt).mul_(gamma)
+            if reduced_threshold is not None:
+                dfocal.div_(reduced_threshold).masked_fill_(pt < reduced_threshold, 0)
+
+        grad_input = None
+        if grad_loss is not None:
+            # d(loss)/dx = weight * (d(focal_term)/dx * logpt + focal_term * dlogpt)
+            grad_input = dfocal * logpt + focal_term * dlogpt
+            if weight is not None:
+                grad_input.mul_(weight)
+            grad_input.mul_(grad_loss)
+
+        if grad_focal_term is not None:
+            dfocal.mul_(grad_focal_term)
+            grad_input = dfocal if grad_input is None else grad_input.add_(dfocal)
+
+        return grad_input, None, None, None, None
 
 
 def cauchy_loss(input: torch.Tensor,
                 target: torch.Tensor,
                 c: float = 1.0,
-                reduction='mean'):
+                reduction='mean',
+                ignore_index=None):
+
+    mask = target != ignore_index if ignore_index is not None else None
 
     x = input - target
     loss = torch.log(0.5 * (x / c) ** 2 + 1)
 
-    if reduction == 'sum':
-        loss = loss.sum()
-
-    if reduction == 'mean':
-        loss = loss.mean()
-
-    return loss
+    return masked_reduce(loss, mask, reduction)
 
 
 def wing_loss(input: torch.Tensor,
               target: torch.Tensor,
               width=5,
               curvature=0.5,
-              reduction="mean") -> torch.Tensor:
+              reduction="mean",
+              scripted=False) -> torch.Tensor:
     """
     https://arxiv.org/pdf/1711.06753.pdf
 
@@ -99,20 +278,13 @@ def wing_loss(input: torch.Tensor,
         width:
         curvature:
         reduction:
+        scripted: Whether to run the TorchScript compiled version of the loss
     Returns:
 
     """
 
-    diff_abs = (target - input).abs()
-    loss = diff_abs.clone()
-
-    idx_smaller = diff_abs < width
-    idx_bigger = diff_abs >= width
-
-    loss[idx_smaller] = width * torch.log(1 + diff_abs[idx_smaller] / curvature)
-
-    C = width - width * math.log(1 + width / curvature)
-    loss[idx_bigger] = loss[idx_bigger] - C
+    loss_fn = _scripted_wing_loss_elementwise() if scripted else _wing_loss_elementwise
+    loss = loss_fn(input, target, float(width), float(curvature), wing_loss_constant(width, curvature))
 
     if reduction == "sum":
         loss = loss.sum()
@@ -123,6 +295,26 @@ def wing_loss(input: torch.Tensor,
     return loss
 
 
+def wing_loss_constant(width=5, curvature=0.5) -> float:
+    """Offset that makes both pieces of the wing loss meet at `width`."""
+    return width - width * math.log(1 + width / curvature)
+
+
+def _wing_loss_elementwise(input: torch.Tensor,
+                           target: torch.Tensor,
+                           width: float,
+                           curvature: float,
+                           constant: float) -> torch.Tensor:
+    # Both branches are computed, but no masks are materialized for indexing
+    diff_abs = (target - input).abs()
+    return torch.where(diff_abs < width, width * torch.log1p(diff_abs / curvature), diff_abs - constant)
+
+
+@lru_cache(maxsize=None)
+def _scripted_wing_loss_elementwise():
+    return torch.jit.script(_wing_loss_elementwise)
+
+
 def label_smoothed_nll_loss(lprobs: torch.Tensor,
                             target: torch.Tensor,
                             epsilon: float,
@@ -148,32 +340,119 @@ def label_smoothed_nll_loss(lprobs: torch.Tensor,
     if target.dim() == lprobs.dim() - 1:
         target = target.unsqueeze(dim)
 
+    mask = None
     if ignore_index is not None:
-        pad_mask = target.eq(ignore_index)
-        target = target.masked_fill(pad_mask, 0)
-        nll_loss = -lprobs.gather(dim=dim, index=target)
-        smooth_loss = -lprobs.sum(dim=dim, keepdim=True)
-
-        # nll_loss.masked_fill_(pad_mask, 0.0)
-        # smooth_loss.masked_fill_(pad_mask, 0.0)
-        nll_loss = nll_loss.masked_fill(pad_mask, 0.0)
-        smooth_loss = smooth_loss.masked_fill(pad_mask, 0.0)
-    else:
-        nll_loss = -lprobs.gather(dim=dim, index=target)
-        smooth_loss = -lprobs.sum(dim=dim, keepdim=True)
+        mask = target.ne(ignore_index)
+        target = target.masked_fill(~mask, 0)
+        mask = mask.squeeze(dim)
 
-        nll_loss = nll_loss.squeeze(dim)
-        smooth_loss = smooth_loss.squeeze(dim)
+    nll_loss = -lprobs.gather(dim=dim, index=target).squeeze(dim)
+    smooth_loss = -lprobs.sum(dim=dim)
 
-    if reduction == "sum":
-        nll_loss = nll_loss.sum()
-        smooth_loss = smooth_loss.sum()
-    if reduction == "mean":
-        nll_loss = nll_loss.mean()
-        smooth_loss = smooth_loss.mean()
+    nll_loss = masked_reduce(nll_loss, mask, reduction)
+    smooth_loss = masked_reduce(smooth_loss, mask, reduction)
 
     eps_i = epsilon / lprobs.size(dim)
     loss = (1.0 - epsilon) * nll_loss + eps_i * smooth_loss
 
     return loss
 
+
+def chunked_label_smoothed_cross_entropy(hidden: torch.Tensor,
+                                         weight: torch.Tensor,
+                                         target: torch.Tensor,
+                                         epsilon: float = 0.0,
+                                         bias: Optional[torch.Tensor] = None,
+                                         ignore_index=None,
+                                         reduction="mean",
+                                         chunk_size: int = 1024) -> torch.Tensor:
+    """Same as `label_smoothed_nll_loss` over `log_softmax(linear(hidden, weight, bias))`,
+    but never materializes logits of all the rows at once.
+
+    Logits are computed for `chunk_size` rows at a time and recomputed on backward,
+    so the peak memory scales with `chunk_size * V` rather than `N * V`.
+
+    Args:
+        hidden: Hidden states of shape (*, H)
+        weight: Output projection of shape (V, H)
+        target: Class indices of shape (*)
+        epsilon: Label smoothing factor
+        bias: Output projection bias of shape (V)
+        ignore_index: Target value that doesn't contribute to the loss
+        reduction: 'none' | 'mean' | 'sum'
+        chunk_size: Number of rows to compute the logits for at once
+
+    Returns:
+        _torch.Tensor: The loss value tensor
+    """
+
+    mask = None
+    if ignore_index is not None:
+        mask = target.ne(ignore_index)
+        target = target.masked_fill(~mask, 0)
+
+    loss = _ChunkedSmoothCrossEntropyFunction.apply(
+        hidden.reshape(-1, hidden.size(-1)), weight, bias, target.reshape(-1), float(epsilon), chunk_size)
+    loss = loss.view(target.shape)
+
+    return masked_reduce(loss, mask, reduction)
+
+
+class _ChunkedSmoothCrossEntropyFunction(torch.autograd.Function):
+    """Label smoothed cross entropy of a linear projection, computed by chunks of rows."""
+
+    @staticmethod
+    def forward(ctx, hidden, weight, bias, target, epsilon, chunk_size):
+        num_classes = weight.size(0)
+
+        # Half precision logits are accumulated in float32
+        dtype = torch.promote_types(hidden.dtype, torch.float32)
+        loss = hidden.new_empty(hidden.size(0), dtype=dtype)
+        lse = hidden.new_empty(hidden.size(0), dtype=dtype)
+
+        for start in range(0, hidden.size(0), chunk_size):
+            rows = slice(start, start + chunk_size)
+            logits = F.linear(hidden[rows], weight, bias).to(dtype)
+
+            lse[rows] = torch.logsumexp(logits, dim=-1)
+            nll_loss = lse[rows] - logits.gather(1, target[rows].unsqueeze(1)).squeeze(1)
+            smooth_loss = num_classes * lse[rows] - logits.sum(-1)
+            loss[rows] = (1.0 - epsilon) * nll_loss + epsilon / num_classes * smooth_loss
+
+        ctx.save_for_backward(hidden, weight, bias, target, lse)
+        ctx.epsilon = epsilon
+        ctx.chunk_size = chunk_size
+
+        return loss.to(hidden.dtype)
+
+    @staticmethod
+    @once_differentiable
+    def backward(ctx, grad_loss):
+        hidden, weight, bias, target, lse = ctx.saved_tensors
+        epsilon, chunk_size = ctx.epsilon, ctx.chunk_size
+        num_classes = weight.size(0)
+
+        grad_hidden = torch.empty_like(hidden) if ctx.needs_input_grad[0] else None
+        grad_weight = torch.zeros_like(weight) if ctx.needs_input_grad[1] else None
+        grad_bias = torch.zeros_like(bias) if bias is not None and ctx.needs_input_grad[2] else None
+
+        for start in range(0, hidden.size(0), chunk_size):
+            rows = slice(start, start + chunk_size)
+            logits = F.linear(hidden[rows], weight, bias).to(lse.dtype)
+
+            # d(loss)/d(logits) = softmax - (1 - epsilon) * one_hot - epsilon / V
+            grad_logits = logits.sub_(lse[rows].unsqueeze(1)).exp_()
+            grad_logits.scatter_add_(1, target[rows].unsqueeze(1),
+                                     grad_logits.new_full((grad_logits.size(0), 1), epsilon - 1.0))
+            grad_logits.sub_(epsilon / num_classes)
+            grad_logits.mul_(grad_loss[rows].unsqueeze(1))
+            grad_logits = grad_logits.to(weight.dtype)
+
+            if grad_hidden is not None:
+                grad_hidden[rows] = grad_logits @ weight
+            if grad_weight is not None:
+                grad_weight.addmm_(grad_logits.t(), hidden[rows])
+            if grad_bias is not None:
+                grad_bias.add_(grad_logits.sum(0))
+
+        return grad_hidden, grad_weight, grad_bias, None, None, None
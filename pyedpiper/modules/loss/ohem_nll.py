@@ -10,28 +10,77 @@ class OHEMNLLLoss(nn.NLLLoss):
 
     Original from http://www.erogol.com/online-hard-example-mining-pytorch/
 
+    Works with dense targets as well, e. g. input of shape (N, C, H, W) and target of shape (N, H, W),
+    in which case every pixel is an example to mine.
+
+    :param ratio: Fraction of the hardest valid examples to keep.
+    Either a single number (or a single element tensor) or a sequence with a separate ratio for every class.
+    :param ignore_index: Target value that is never selected as a hard example.
     """
 
-    def __init__(self, ratio):
-        super().__init__(None, True)
+    def __init__(self, ratio, ignore_index=-100):
+        super().__init__(ignore_index=ignore_index)
         self.ratio = ratio
 
     def forward(self, input, target, ratio=None):
-        input = F.log_softmax(input, dim=1)
-
         if ratio is not None:
             self.ratio = ratio
 
-        num_inst = input.size(0)
-        num_hns = int(self.ratio * num_inst)
-        x_ = input.clone()
-        inst_losses = torch.zeros(num_inst).type_as(input)
+        return self._forward_log_probs(F.log_softmax(input, dim=1), target)
+
+    def forward_shared(self, intermediates):
+        return self._forward_log_probs(intermediates.log_probs(1), intermediates.target)
+
+    def _forward_log_probs(self, input, target):
+        not_ignored = target != self.ignore_index
+        target = target.masked_fill(~not_ignored, 0)
+
+        # Loss of every instance (or pixel) at once
+        inst_losses = -input.gather(1, target.unsqueeze(1)).squeeze(1)
+
+        inst_losses = inst_losses.reshape(-1)
+        not_ignored = not_ignored.reshape(-1)
+        target = target.reshape(-1)
+
+        if torch.as_tensor(self.ratio).numel() == 1:
+            selected = self._select_hardest(inst_losses, not_ignored)
+        else:
+            selected = self._select_hardest_per_class(inst_losses, not_ignored, target, input.size(1))
+
+        selected = selected.type_as(inst_losses)
+        return (inst_losses * selected).sum() / selected.sum().clamp_min(1)
+
+    def _select_hardest(self, inst_losses, not_ignored):
+        # Ratio of the valid instances only
+        num_hns = int(float(self.ratio) * int(not_ignored.sum()))
+
+        # Ignored instances go last, since valid losses are never negative
+        _, idxs = inst_losses.masked_fill(~not_ignored, -1).topk(num_hns)
+
+        selected = torch.zeros_like(not_ignored)
+        selected[idxs] = not_ignored[idxs]
+        return selected
+
+    def _select_hardest_per_class(self, inst_losses, not_ignored, target, num_classes):
+        ratio = torch.as_tensor(self.ratio, dtype=inst_losses.dtype, device=inst_losses.device)
+        assert ratio.numel() == num_classes, "Expected a ratio for every one of {} classes, got {}".format(
+            num_classes, ratio.numel())
+
+        # Group instances by class with the hardest ones first within every group
+        order = inst_losses.detach().masked_fill(~not_ignored, -1).argsort(descending=True)
+        positions = torch.arange(order.numel(), device=order.device)
+        order = order[(target[order] * order.numel() + positions).argsort()]
+
+        totals = torch.bincount(target, minlength=num_classes)
+        starts = totals.cumsum(0) - totals
 
-        for idx, label in enumerate(target.data):
-            inst_losses[idx] = -x_.data[idx, label]
+        # Ignored instances are the last ones in their groups and don't count
+        counts = torch.bincount(target, weights=not_ignored.type_as(ratio), minlength=num_classes)
+        limits = (ratio * counts).long()
 
-        _, idxs = inst_losses.topk(num_hns)
-        input_hn = input.index_select(0, idxs)
-        target_hn = target.index_select(0, idxs)
+        sorted_target = target[order]
+        ranks = positions - starts[sorted_target]
 
-        return F.nll_loss(input_hn, target_hn)
+        selected = torch.zeros_like(not_ignored)
+        selected[order] = ranks < limits[sorted_target]
+        return selected & not_ignored
@@ -1,6 +1,10 @@
 import warnings
 from typing import Optional
 
+import torch
+
+__all__ = ["masked_reduce"]
+
 
 # In order to support previous versions, accept boolean size_average and reduce
 # and convert them into the new constants for now
@@ -48,3 +52,35 @@ def legacy_get_string(size_average, reduce, emit_warning=True):
 
 def legacy_get_enum(size_average: Optional[bool], reduce: Optional[bool], emit_warning: bool = True) -> int:
     return get_enum(legacy_get_string(size_average, reduce, emit_warning))
+
+
+def masked_reduce(loss: torch.Tensor, mask: Optional[torch.Tensor] = None, reduction: str = "mean") -> torch.Tensor:
+    """Reduces the loss leaving out the masked elements.
+
+    Masked elements are zeroed rather than filtered out, so the shapes stay static
+    and no host-device synchronization happens. 'mean' divides by the number of valid elements.
+
+    Args:
+        loss (torch.Tensor): Unreduced loss
+        mask (torch.Tensor, optional): Boolean tensor broadcastable to the loss, `False` for the elements to leave out
+        reduction (str): 'none' | 'mean' | 'sum' | 'batchwise_mean'
+
+    Returns:
+        torch.Tensor: The reduced loss
+    """
+
+    if mask is not None:
+        loss = loss.masked_fill(~mask, 0)
+
+    if reduction == "mean":
+        if mask is None:
+            return loss.mean()
+        return loss.sum() / mask.expand_as(loss).sum().clamp_min(1)
+
+    if reduction == "sum":
+        return loss.sum()
+
+    if reduction == "batchwise_mean":
+        return loss.sum(0)
+
+    return loss
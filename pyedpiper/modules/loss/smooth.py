@@ -3,9 +3,9 @@ from typing import Optional
 import torch.nn.functional as F
 from torch import nn, Tensor
 
-from .functional import label_smoothed_nll_loss
+from .functional import chunked_label_smoothed_cross_entropy, label_smoothed_nll_loss
 
-__all__ = ["SmoothCrossEntropyLoss"]
+__all__ = ["ChunkedSmoothCrossEntropyLoss", "SmoothCrossEntropyLoss"]
 
 
 class SmoothCrossEntropyLoss(nn.Module):
@@ -27,11 +27,51 @@ class SmoothCrossEntropyLoss(nn.Module):
 
     def forward(self, input: Tensor, target: Tensor) -> Tensor:
         log_prob = F.log_softmax(input, dim=self.dim)
+        return self._forward_log_probs(log_prob, target)
+
+    def forward_shared(self, intermediates) -> Tensor:
+        return self._forward_log_probs(intermediates.log_probs(self.dim), intermediates.target)
+
+    def _forward_log_probs(self, log_prob: Tensor, target: Tensor) -> Tensor:
         return label_smoothed_nll_loss(
             log_prob,
             target,
-            epsilon=self.smooth_factor,
+            epsilon=self.smooth_factor or 0.0,
             ignore_index=self.ignore_index,
             reduction=self.reduction,
             dim=self.dim,
         )
+
+
+class ChunkedSmoothCrossEntropyLoss(nn.Module):
+    """Label smoothed cross entropy over hidden states and an output projection, e.g. of a language model head.
+
+    Logits are computed for `chunk_size` rows at a time and recomputed on backward,
+    so they're never materialized for the whole batch, see `chunked_label_smoothed_cross_entropy`.
+    """
+
+    __constants__ = ["reduction", "ignore_index", "smooth_factor", "chunk_size"]
+
+    def __init__(self,
+                 reduction="mean",
+                 smooth_factor: Optional[float] = None,
+                 ignore_index: Optional[int] = None,
+                 chunk_size: int = 1024):
+
+        super().__init__()
+        self.smooth_factor = smooth_factor
+        self.ignore_index = ignore_index
+        self.reduction = reduction
+        self.chunk_size = chunk_size
+
+    def forward(self, hidden: Tensor, weight: Tensor, target: Tensor, bias: Optional[Tensor] = None) -> Tensor:
+        return chunked_label_smoothed_cross_entropy(
+            hidden,
+            weight,
+            target,
+            epsilon=self.smooth_factor or 0.0,
+            bias=bias,
+            ignore_index=self.ignore_index,
+            reduction=self.reduction,
+            chunk_size=self.chunk_size,
+        )
@@ -5,12 +5,17 @@ __all__ = ["WingLoss"]
 
 
 class WingLoss(Loss):
+    """
+    :param scripted: Whether to run the TorchScript compiled version of the loss.
+    """
+
     __constants__ = ["width", "reduction", "curvature"]
 
-    def __init__(self, width=5, curvature=0.5, reduction="mean"):
+    def __init__(self, width=5, curvature=0.5, reduction="mean", scripted=False):
         super(WingLoss, self).__init__(reduction=reduction)
-        self.width = width
-        self.curvature = curvature
+        self.width = float(width)
+        self.curvature = float(curvature)
+        self.scripted = scripted
 
     def forward(self, prediction, target):
-        return wing_loss(prediction, target, self.width, self.curvature, self.reduction)
+        return wing_loss(prediction, target, self.width, self.curvature, self.reduction, scripted=self.scripted)
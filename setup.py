@@ -38,7 +38,7 @@ setup(
     include_package_data=True,
     zip_safe=False,
     keywords=['deep learning', 'pytorch', 'pytorch lightning', 'AI'],
-    python_requires='>=3.6',
+    python_requires='>=3.7',
     setup_requires=[],
     classifiers=[
         'Environment :: Console',
@@ -57,7 +57,6 @@ setup(
         # Specify the Python versions you support here. In particular, ensure
         # that you indicate whether you support Python 2, Python 3 or both.
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.6',
         'Programming Language :: Python :: 3.7',
         'Programming Language :: Python :: 3.8',
     ],
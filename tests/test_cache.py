@@ -0,0 +1,116 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyedpiper.data.cache import DiskImageCache, LRUImageCache
+from pyedpiper.data.datasets import ImageDataset
+
+
+def _image(value, size=10):
+    return np.full((size, size), value, dtype=np.uint8)
+
+
+def test_lru_cache_evicts_by_bytes():
+    cache = LRUImageCache(max_bytes=250)
+    cache.put('a', _image(1))
+    cache.put('b', _image(2))
+    assert cache.get('a') is not None
+
+    # `b` is the least recently used one now
+    cache.put('c', _image(3))
+    assert cache.get('b') is None
+    assert cache.get('c')[0, 0] == 3
+
+    info = cache.cache_info()
+    assert (info.hits, info.misses, info.currsize, info.currbytes) == (2, 1, 2, 200)
+    assert cache.hit_rate == pytest.approx(2 / 3)
+
+
+def test_lru_cache_returns_copies():
+    cache = LRUImageCache(max_bytes=1000)
+    cache.put('a', _image(1))
+    cache.get('a')[:] = 0
+    assert cache.get('a')[0, 0] == 1
+
+
+def test_lru_cache_pickles_empty():
+    cache = LRUImageCache(max_bytes=1000)
+    cache.put('a', _image(1))
+
+    restored = pickle.loads(pickle.dumps(cache))
+    assert restored.get('a') is None
+    restored.put('a', _image(1))
+    assert restored.cache_info().currsize == 1
+
+
+def test_disk_cache_is_shared(tmp_path):
+    writer = DiskImageCache(tmp_path / 'cache')
+    reader = DiskImageCache(tmp_path / 'cache')
+
+    assert reader.get('a') is None
+    writer.put('a', _image(7))
+
+    image = reader.get('a')
+    assert image.flags.writeable
+    np.testing.assert_array_equal(image, _image(7))
+    assert reader.cache_info().hits == 1
+    assert reader.cache_info().misses == 1
+
+
+def test_disk_cache_respects_budget(tmp_path):
+    cache = DiskImageCache(tmp_path / 'cache', max_bytes=300)
+    cache.put('a', _image(1))
+    cache.put('b', _image(2))
+    assert cache.get('a') is not None
+    assert cache.get('b') is None
+
+
+def test_disk_cache_budget_is_shared(tmp_path):
+    # Every worker opens the cache on its own, the budget still holds for the directory
+    first = DiskImageCache(tmp_path / 'cache', max_bytes=300)
+    second = pickle.loads(pickle.dumps(first))
+
+    first.put('a', _image(1))
+    second.put('b', _image(2))
+    assert first.get('b') is None
+
+    # Overwriting an image accounts for the replaced file
+    first.put('a', _image(3))
+    assert second.get('a')[0, 0] == 3
+    assert second.cache_info().currbytes == first.cache_info().currbytes == first._path('a').stat().st_size
+
+    second.cache_clear()
+    first.put('b', _image(2))
+    assert first.get('b') is not None
+    assert not list((tmp_path / 'cache').glob('*.tmp'))
+
+
+@pytest.mark.parametrize('make_cache', [
+    lambda path: LRUImageCache(max_bytes=2 ** 20),
+    lambda path: DiskImageCache(path / 'cache'),
+])
+def test_image_dataset_uses_cache(tmp_path, make_cache):
+    root = tmp_path / 'images'
+    root.mkdir()
+    for name in ('a', 'b'):
+        (root / f'{name}.npy').touch()
+
+    loaded = []
+
+    def loader(path):
+        loaded.append(path)
+        return np.ones((4, 4), dtype=np.float32)
+
+    cache = make_cache(tmp_path)
+    dataset = ImageDataset(root, pd.DataFrame({'id': ['a', 'b'], 'label': [0, 1]}), 'label', 'id',
+                           extensions=('npy',), loader=loader, cache=cache)
+
+    for _ in range(3):
+        for idx in range(len(dataset)):
+            image, _ = dataset[idx]
+            assert image.dtype == np.uint8 and image[0, 0] == 255
+
+    assert len(loaded) == 2
+    assert cache.cache_info().hits == 4
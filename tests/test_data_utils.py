@@ -0,0 +1,192 @@
+import importlib.util
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+from PIL import Image
+
+from pyedpiper.data.cache import LRUImageCache
+from pyedpiper.data.datasets import ImageDataset
+from pyedpiper.data.utils import available_decoders, get_class_weights, get_decoder
+
+
+@pytest.fixture
+def image():
+    return np.random.RandomState(0).randint(0, 256, size=(32, 48, 3), dtype=np.uint8)
+
+
+@pytest.mark.parametrize('name', available_decoders())
+@pytest.mark.parametrize('mode', ['RGB', 'RGBA', 'L'])
+def test_decoders_match_png(tmp_path, image, name, mode):
+    expected = np.asarray(Image.fromarray(image).convert(mode))
+    Image.fromarray(expected).save(tmp_path / 'image.png')
+
+    decoded = get_decoder(name)(tmp_path / 'image.png')
+    assert decoded.dtype == np.uint8
+    np.testing.assert_array_equal(decoded, expected)
+
+
+def test_pil_decoder_converts_palette(tmp_path, image):
+    Image.fromarray(image).convert('P').save(tmp_path / 'image.png')
+    assert get_decoder('pil')(tmp_path / 'image.png').shape == (32, 48, 4)
+
+
+def test_pil_decoder_reduces_jpeg(tmp_path, image):
+    Image.fromarray(image).save(tmp_path / 'image.jpg')
+
+    decoded = get_decoder('pil', reduce=2)(tmp_path / 'image.jpg')
+    assert decoded.shape == (16, 24, 3)
+    assert decoded.flags.writeable
+
+
+@pytest.mark.parametrize('name', sorted({'pil', 'opencv'}.intersection(available_decoders())))
+@pytest.mark.parametrize('mode, ext', [('L', 'jpg'), ('RGB', 'jpg'), ('L', 'png'), ('RGBA', 'png')])
+def test_reduced_decoders_keep_channels(tmp_path, image, name, mode, ext):
+    Image.fromarray(image).convert(mode).save(tmp_path / f'image.{ext}')
+
+    full = get_decoder(name)(tmp_path / f'image.{ext}')
+    reduced = get_decoder(name, reduce=2)(tmp_path / f'image.{ext}')
+    assert reduced.shape == (16, 24) + full.shape[2:]
+
+
+def test_torchvision_decoder_returns_tensor(tmp_path, image):
+    Image.fromarray(image).save(tmp_path / 'image.png')
+
+    tensor = get_decoder('torchvision', as_tensor=True)(tmp_path / 'image.png')
+    assert tuple(tensor.shape) == (3, 32, 48)
+    np.testing.assert_array_equal(tensor.permute(1, 2, 0).numpy(), image)
+
+
+def test_get_decoder_errors():
+    with pytest.raises(KeyError, match="Unknown decoder"):
+        get_decoder('missing')
+
+    if importlib.util.find_spec('cv2') is None:
+        with pytest.raises(ImportError, match="requires `cv2`"):
+            get_decoder('opencv')
+
+
+def test_decoder_pickles(tmp_path, image):
+    Image.fromarray(image).save(tmp_path / 'image.png')
+
+    decoder = pickle.loads(pickle.dumps(get_decoder('pil', reduce=1)))
+    np.testing.assert_array_equal(decoder(tmp_path / 'image.png'), image)
+
+
+def test_image_dataset_decodes_uint8(tmp_path, image):
+    root = tmp_path / 'images'
+    root.mkdir()
+    Image.fromarray(image).save(root / 'a.png')
+
+    dataset = ImageDataset(root, pd.DataFrame({'id': ['a'], 'label': [1]}), 'label', 'id')
+    decoded, target = dataset[0]
+
+    np.testing.assert_array_equal(decoded, image)
+    assert target == 1
+
+
+def test_image_dataset_with_tensor_decoder(tmp_path, image):
+    root = tmp_path / 'images'
+    root.mkdir()
+    Image.fromarray(image).save(root / 'a.png')
+    labels = pd.DataFrame({'id': ['a'], 'label': [1]})
+
+    decoder = get_decoder('torchvision', as_tensor=True)
+    decoded, _ = ImageDataset(root, labels, 'label', 'id', loader=decoder)[0]
+    assert decoded.dtype == torch.uint8
+    np.testing.assert_array_equal(decoded.permute(1, 2, 0).numpy(), image)
+
+    # Float tensors are converted like float arrays are
+    scaled = ImageDataset(root, labels, 'label', 'id', loader=lambda path: decoder(path).float() / 255)[0][0]
+    assert torch.equal(scaled, decoded)
+
+    # Caches store arrays only
+    with pytest.raises(ValueError, match="store arrays"):
+        ImageDataset(root, labels, 'label', 'id', loader=decoder, cache=LRUImageCache(2 ** 20))
+
+    dataset = ImageDataset(root, labels, 'label', 'id', loader=lambda path: decoder(path).float() / 255,
+                           cache=LRUImageCache(2 ** 20))
+    with pytest.raises(TypeError, match="store arrays"):
+        dataset[0]
+
+
+def _reference_weights(targets, use_max=True):
+    counts = np.array([len(np.where(targets == t)[0]) for t in np.unique(targets)])
+    return counts.max() / counts if use_max else 1. / counts
+
+
+@pytest.mark.parametrize('targets', [
+    np.array([0, 2, 2, 5, 5, 5, 5]),
+    np.array([-1, 3, 3, 10 ** 9]),
+    np.array(['cat', 'dog', 'dog', 'bird']),
+    np.array([0.5, 0.5, 1.5]),
+])
+@pytest.mark.parametrize('use_max', [True, False])
+def test_class_weights_match_reference(targets, use_max):
+
+    np.testing.assert_allclose(get_class_weights(targets, use_max=use_max), _reference_weights(targets, use_max))
+    np.testing.assert_allclose(get_class_weights(targets.tolist(), use_max=use_max),
+                               _reference_weights(targets, use_max))
+
+
+def test_class_weights_from_chunks():
+
+    targets = np.random.RandomState(0).randint(0, 50, size=10_000)
+    expected = get_class_weights(targets)
+
+    chunks = (targets[start:start + 999] for start in range(0, len(targets), 999))
+    np.testing.assert_allclose(get_class_weights(chunks), expected)
+
+    batches = torch.utils.data.DataLoader(torch.from_numpy(targets), batch_size=256)
+    np.testing.assert_allclose(get_class_weights(batches), expected)
+
+    frame = pd.DataFrame({'label': targets})
+    columns = (frame.iloc[start:start + 1500]['label'] for start in range(0, len(frame), 1500))
+    np.testing.assert_allclose(get_class_weights(columns), expected)
+
+    with pytest.raises(ValueError):
+        get_class_weights(iter([]))
+
+
+def test_class_weights_from_labels_and_uneven_chunks():
+    expected = get_class_weights(np.array([0, 1, 2, 3]))
+
+    np.testing.assert_allclose(get_class_weights(range(4)), expected)
+    np.testing.assert_allclose(get_class_weights(label for label in [3, 2, 1, 0]), expected)
+    np.testing.assert_allclose(get_class_weights({0, 1, 2, 3}), expected)
+    np.testing.assert_allclose(get_class_weights([torch.tensor(label) for label in range(4)]), expected)
+
+    targets = np.array([0, 0, 1, 2, 2, 2, 3])
+    expected = get_class_weights(targets)
+
+    np.testing.assert_allclose(get_class_weights([[0, 0], [1], [2, 2, 2, 3]]), expected)
+    np.testing.assert_allclose(get_class_weights([targets[:1], torch.from_numpy(targets[1:])]), expected)
+    np.testing.assert_allclose(get_class_weights([0, [0, 1], np.int64(2), (2, 2), 3]), expected)
+
+
+def test_class_weights_on_tensors():
+
+    targets = np.array([1, 1, 1, 4, 4, 7])
+    weights = get_class_weights(torch.from_numpy(targets))
+
+    assert isinstance(weights, torch.Tensor) and weights.dtype == torch.float32
+    np.testing.assert_allclose(weights.numpy(), _reference_weights(targets), rtol=1e-6)
+    np.testing.assert_allclose(get_class_weights(torch.tensor([0.5, 2.5, 2.5]), use_max=False).numpy(), [1, 0.5])
+
+
+def test_class_weights_effective_number():
+
+    targets = np.array([0] * 100 + [1] * 10 + [2])
+    beta = 0.99
+
+    counts = np.array([100, 10, 1])
+    effective = (1 - beta ** counts) / (1 - beta)
+    expected = effective[0] / effective
+
+    np.testing.assert_allclose(get_class_weights(targets, beta=beta), expected)
+    np.testing.assert_allclose(get_class_weights(torch.from_numpy(targets), beta=beta).numpy(), expected, rtol=1e-6)
+
+    # Effective numbers approach the counts as beta goes to one
+    np.testing.assert_allclose(get_class_weights(targets, beta=1 - 1e-9), _reference_weights(targets), rtol=1e-6)
@@ -0,0 +1,233 @@
+import os
+import pickle
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+from torch.utils.data import DataLoader
+
+from pyedpiper.data.datasets import BaseDataset, ImageDataset
+from pyedpiper.data.files import PackedPaths, scan_files
+
+
+class TargetDataset(BaseDataset):
+
+    def __getitem__(self, idx):
+        return self.samples[idx]
+
+
+def _touch(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'')
+
+
+@pytest.fixture
+def root(tmp_path):
+    root = tmp_path / 'images'
+    for name in ('a.jpg', 'b.png', 'c.txt', 'nested/d.jpg', 'nested/deeper/e.png'):
+        _touch(root / name)
+    (root / 'folder.jpg').mkdir()
+    return root
+
+
+def _names(files, root):
+    return [str(file.relative_to(root)) for file in files]
+
+
+def test_scan_files_single_pass(root):
+    assert _names(scan_files(root, ('.jpg', 'png')), root) == ['a.jpg', 'b.png']
+
+
+@pytest.mark.parametrize('num_workers', [None, 4])
+def test_scan_files_recursive(root, num_workers):
+    files = scan_files(root, ('jpg', 'png'), recursive=True, num_workers=num_workers)
+    assert _names(files, root) == ['a.jpg', 'b.png', 'nested/d.jpg', 'nested/deeper/e.png']
+
+
+def test_scan_files_index_cache(root, tmp_path, monkeypatch):
+    cache_dir = tmp_path / 'cache'
+    expected = scan_files(root, ('jpg', 'png'), recursive=True, cache_dir=cache_dir)
+    assert len(list(cache_dir.iterdir())) == 1
+
+    scandir = os.scandir
+
+    def fail(path):
+        raise AssertionError(f"Unexpected scan of `{path}`")
+
+    # Unchanged directories are served from the index without listing them
+    monkeypatch.setattr(os, 'scandir', fail)
+    assert scan_files(root, ('jpg', 'png'), recursive=True, cache_dir=cache_dir) == expected
+    monkeypatch.setattr(os, 'scandir', scandir)
+
+    # A file added to a nested directory invalidates the index
+    _touch(root / 'nested' / 'deeper' / 'f.jpg')
+    os.utime(root / 'nested' / 'deeper', ns=(0, 0))
+
+    files = scan_files(root, ('jpg', 'png'), recursive=True, cache_dir=cache_dir)
+    assert _names(files, root)[-1] == 'nested/deeper/f.jpg'
+
+
+def test_scan_files_skips_symlinked_directories(root):
+    (root / 'nested' / 'loop').symlink_to(root, target_is_directory=True)
+    (root / 'linked.jpg').symlink_to(root / 'a.jpg')
+
+    files = scan_files(root, ('jpg', 'png'), recursive=True)
+    assert _names(files, root) == ['a.jpg', 'b.png', 'linked.jpg', 'nested/d.jpg', 'nested/deeper/e.png']
+
+
+def test_scan_files_index_keeps_line_breaks(root, tmp_path):
+    _touch(root / 'line\nbreak.jpg')
+    _touch(root / 'carriage\rreturn.png')
+
+    cache_dir = tmp_path / 'cache'
+    expected = scan_files(root, ('jpg', 'png'), cache_dir=cache_dir)
+    assert len(expected) == 4
+
+    assert scan_files(root, ('jpg', 'png'), cache_dir=cache_dir) == expected
+
+
+def test_dataset_scans_files(root, tmp_path):
+    dataset = TargetDataset(root,
+                            labels=1,
+                            key=None,
+                            index='id',
+                            extensions=('jpg', 'png'),
+                            loader=None,
+                            recursive=True,
+                            index_cache=tmp_path / 'cache')
+
+    assert len(dataset) == 4
+    assert dataset.targets.tolist() == [1, 1, 1, 1]
+
+
+def _dataset(root, labels, key='label', index='id'):
+    return TargetDataset(root, labels=labels, key=key, index=index, extensions=('jpg', 'png'), loader=None)
+
+
+@pytest.mark.parametrize('labels, key', [
+    (pd.DataFrame({'id': ['b', 'x', 'a'], 'label': [2, 0, 1]}), 'label'),
+    ({'a': {'label': 1}, 'b': {'label': 2}}, 'label'),
+    ({'a': 1, 'b': 2, 'x': 0}, None),
+])
+def test_dataset_joins_labels(root, labels, key):
+    dataset = _dataset(root, labels, key=key)
+
+    assert isinstance(dataset.targets, np.ndarray)
+    assert dataset.targets.tolist() == [1, 2]
+    assert [(path.name, target) for path, target in dataset.samples] == [('a.jpg', 1), ('b.png', 2)]
+
+
+def test_dataset_joins_labels_with_extensions(root):
+    dataset = _dataset(root, pd.DataFrame({'id': ['a.jpg', 'b.png'], 'label': [1, 2]}))
+    assert dataset.targets.tolist() == [1, 2]
+
+
+def test_dataset_reports_missing_labels(root):
+    with pytest.raises(KeyError, match=r"missing for files \(1\): `b`"):
+        _dataset(root, pd.DataFrame({'id': ['a'], 'label': [1]}))
+
+
+def test_dataset_reports_duplicated_labels(root):
+    with pytest.raises(ValueError, match=r"duplicated entries \(1\): `a`"):
+        _dataset(root, pd.DataFrame({'id': ['a', 'b', 'a'], 'label': [1, 2, 3]}))
+
+
+def test_packed_paths(root):
+    files = scan_files(root, ('jpg', 'png'), recursive=True)
+    packed = PackedPaths(files, root=root)
+
+    files = [str(file) for file in files]
+    assert len(packed) == len(files)
+    assert list(packed) == files
+    assert packed[-1] == files[-1]
+    assert packed[1:3] == files[1:3]
+    with pytest.raises(IndexError):
+        packed[len(files)]
+
+
+def test_compact_dataset_matches_regular(root):
+    labels = pd.DataFrame({'id': ['a', 'b', 'd', 'e'], 'label': ['cat', 'dog', 'cat', 'bird']})
+
+    regular = TargetDataset(root, labels, 'label', 'id', ('jpg', 'png'), loader=None, recursive=True)
+    compact = TargetDataset(root, labels, 'label', 'id', ('jpg', 'png'), loader=None, recursive=True, compact=True)
+
+    assert compact.targets.dtype.kind == 'U'
+    assert compact.labels is None
+    assert [(path, target) for path, target in compact.samples] == [
+        (str(path), target) for path, target in regular.samples
+    ]
+    assert compact[2][1] == regular[2][1]
+
+    # Labels passed by the caller are left untouched
+    assert isinstance(labels.index, pd.RangeIndex)
+
+
+def _image_dataset(tmp_path, loader, count=8, **kwargs):
+    root = tmp_path / 'batch'
+    root.mkdir()
+    for idx in range(count):
+        (root / f'{idx}.npy').touch()
+
+    labels = pd.DataFrame({'id': [str(idx) for idx in range(count)], 'label': list(range(count))})
+    return ImageDataset(root, labels, 'label', 'id', extensions=('npy',), loader=loader, **kwargs)
+
+
+def test_get_batch_loads_concurrently(tmp_path):
+    barrier = threading.Barrier(4, timeout=5)
+
+    def loader(path):
+        # Passes only if all four images of the batch are loaded at the same time
+        barrier.wait()
+        return np.full((2, 3, 3), int(Path(path).stem), dtype=np.uint8)
+
+    dataset = _image_dataset(tmp_path, loader, io_threads=4)
+    images, targets = dataset.get_batch([3, 1, 2, 0])
+
+    assert images.dtype == torch.uint8
+    assert images.shape == (4, 2, 3, 3)
+    assert images[:, 0, 0, 0].tolist() == [3, 1, 2, 0]
+    assert targets.tolist() == [3, 1, 2, 0]
+
+
+def test_dataloader_uses_getitems(tmp_path):
+    threads = set()
+
+    def loader(path):
+        threads.add(threading.current_thread().name)
+        return np.zeros((2, 2), dtype=np.uint8)
+
+    dataset = _image_dataset(tmp_path, loader, io_threads=2)
+    batches = list(DataLoader(dataset, batch_size=4))
+
+    assert [images.shape for images, _ in batches] == [(4, 2, 2)] * 2
+    assert all(name.startswith('pyedpiper-io') for name in threads)
+
+
+def _zeros_loader(path):
+    return np.zeros((2, 2), dtype=np.uint8)
+
+
+def test_dataset_with_pool_pickles(tmp_path):
+    dataset = _image_dataset(tmp_path, _zeros_loader, io_threads=2)
+    dataset.__getitems__([0, 1])
+
+    restored = pickle.loads(pickle.dumps(dataset))
+    assert restored._pool is None
+    assert len(restored.__getitems__([0, 1])) == 2
+
+
+def test_dataset_close_stops_pool(tmp_path):
+    dataset = _image_dataset(tmp_path, _zeros_loader, io_threads=2)
+    dataset.__getitems__([0, 1])
+    pool = dataset._pool
+
+    dataset.close()
+    assert dataset._pool is None
+    assert pool._shutdown
+
+    # Closed dataset is still usable
+    assert len(dataset.__getitems__([0, 1])) == 2
+    dataset.close()
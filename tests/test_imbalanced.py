@@ -0,0 +1,184 @@
+import numpy as np
+import pytest
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.utils.data import Subset
+
+from pyedpiper.data.imbalanced import DistributedImbalancedDatasetSampler, ImbalancedDatasetSampler
+
+
+class TargetsDataset(torch.utils.data.Dataset):
+
+    def __init__(self, targets):
+        self.targets = targets
+
+    def __len__(self):
+        return len(self.targets)
+
+    def __getitem__(self, idx):
+        return idx, self.targets[idx]
+
+
+def _dataset():
+    # Class 0 is 9 times as frequent as class 1
+    return TargetsDataset(np.array([0] * 900 + [1] * 100 + [2] * 10))
+
+
+def test_sampler_balances_labels():
+    dataset = _dataset()
+    sampler = ImbalancedDatasetSampler(dataset, num_samples=60_000, generator=torch.Generator().manual_seed(0))
+
+    indices = np.array(list(sampler))
+    labels = dataset.targets[indices]
+    np.testing.assert_allclose(np.bincount(labels) / len(labels), [1 / 3] * 3, atol=0.01)
+
+    # Elements of a label are drawn uniformly
+    assert len(np.unique(indices[labels == 2])) == 10
+    assert np.bincount(indices[labels == 2]).max() < 3 * np.bincount(indices[labels == 2])[1000:].min()
+
+
+def test_sampler_weights_and_reproducibility():
+    dataset = _dataset()
+    sampler = ImbalancedDatasetSampler(dataset, generator=torch.Generator().manual_seed(1))
+
+    assert len(sampler) == len(dataset)
+    assert sampler.weights[0] == 1 / 900 and sampler.weights[-1] == 1 / 10
+
+    first = list(sampler)
+    sampler.generator.manual_seed(1)
+    assert list(sampler) == first
+
+
+def test_sampler_subset_and_indices():
+    dataset = _dataset()
+    subset = Subset(dataset, list(range(890, 1010)))
+
+    indices = list(ImbalancedDatasetSampler(subset, num_samples=1000))
+    assert min(indices) >= 0 and max(indices) < len(subset)
+    assert set(dataset.targets[np.array(subset.indices)[indices]]) == {0, 1, 2}
+
+    drawn = set(ImbalancedDatasetSampler(dataset, indices=[0, 950, 1005], num_samples=100))
+    assert drawn == {0, 950, 1005}
+
+
+def test_sampler_callback_is_called_once_per_index():
+    calls = []
+
+    def callback(dataset, idx):
+        calls.append(idx)
+        return idx % 2
+
+    ImbalancedDatasetSampler(list(range(10)), callback_get_label=callback)
+    assert sorted(calls) == list(range(10))
+
+
+def _distributed(rank, num_replicas=3, **kwargs):
+    sampler = DistributedImbalancedDatasetSampler(_dataset(), num_replicas=num_replicas, rank=rank, seed=7, **kwargs)
+    sampler.block_size = 64
+    return sampler
+
+
+def test_distributed_sampler_shards_shared_sequence():
+    whole = _distributed(0, num_replicas=1, num_samples=999)
+    shards = [_distributed(rank, num_samples=998) for rank in range(3)]
+
+    assert [len(shard) for shard in shards] == [333] * 3
+    assert sum((list(shard) for shard in shards), []) == list(whole)
+
+    for sampler in [whole] + shards:
+        sampler.set_epoch(1)
+    assert sum((list(shard) for shard in shards), []) == list(whole)
+    assert list(whole) != list(_distributed(0, num_replicas=1, num_samples=999))
+
+
+def test_distributed_sampler_resumes():
+    sampler = _distributed(1)
+    sampler.set_epoch(3)
+    expected = list(sampler)
+
+    iterator = iter(sampler)
+    consumed = [next(iterator) for _ in range(100)]
+    state = sampler.state_dict()
+    assert state == {'epoch': 3, 'seed': 7, 'consumed': 100}
+
+    resumed = _distributed(1)
+    resumed.load_state_dict(state)
+    assert consumed + list(resumed) == expected
+
+    # The next epoch starts from the beginning
+    assert resumed.consumed == 0
+
+
+def test_distributed_sampler_resumes_with_set_epoch():
+    sampler = _distributed(1)
+    sampler.set_epoch(3)
+    expected = list(sampler)
+
+    iterator = iter(sampler)
+    consumed = [next(iterator) for _ in range(100)]
+
+    # The usual loop sets the epoch of the restored state again before iterating
+    resumed = _distributed(1)
+    resumed.load_state_dict(sampler.state_dict())
+    resumed.set_epoch(3)
+    assert len(resumed) == len(expected) - 100
+
+    # Length stays the same within the epoch
+    iterator = iter(resumed)
+    rest = [next(iterator)]
+    assert len(resumed) == len(expected) - 100
+    rest += list(iterator)
+    assert consumed + rest == expected
+
+    assert len(resumed) == len(expected)
+    resumed.set_epoch(4)
+    assert len(list(resumed)) == len(expected)
+
+
+def test_distributed_sampler_state_of_processed_samples():
+    sampler = _distributed(0)
+    expected = list(sampler)
+
+    # The loader has drawn 100 samples ahead, the training has processed 40 of them
+    iterator = iter(sampler)
+    drawn = [next(iterator) for _ in range(100)]
+    state = sampler.state_dict(processed=40)
+    assert state['consumed'] == 40
+
+    resumed = _distributed(0)
+    resumed.load_state_dict(state)
+    iterator = iter(resumed)
+    drawn = [next(iterator) for _ in range(10)]
+
+    # Processed samples count from the resumed position
+    assert resumed.state_dict(processed=5)['consumed'] == 45
+    assert expected[:40] + drawn + list(iterator) == expected
+
+
+def _gloo_worker(rank, world_size, init_file, output):
+    dist.init_process_group('gloo', init_method=f'file://{init_file}', rank=rank, world_size=world_size)
+    try:
+        sampler = DistributedImbalancedDatasetSampler(_dataset(), seed=3)
+        sampler.set_epoch(2)
+        shards = [None] * world_size
+        dist.all_gather_object(shards, list(sampler))
+        if rank == 0:
+            torch.save(shards, output)
+    finally:
+        dist.destroy_process_group()
+
+
+def test_distributed_sampler_with_gloo(tmp_path):
+    if not dist.is_available():
+        pytest.skip("torch.distributed isn't available")
+
+    output = tmp_path / 'shards.pt'
+    mp.spawn(_gloo_worker, args=(2, str(tmp_path / 'init'), str(output)), nprocs=2)
+
+    whole = DistributedImbalancedDatasetSampler(_dataset(), num_replicas=1, rank=0, seed=3)
+    whole.set_epoch(2)
+
+    shards = torch.load(output)
+    assert [len(shard) for shard in shards] == [505, 505]
+    assert shards[0] + shards[1] == list(whole)
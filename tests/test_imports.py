@@ -0,0 +1,38 @@
+import subprocess
+import sys
+
+import pytest
+
+from tests import PACKAGE_ROOT
+
+HEAVY_MODULES = ("matplotlib", "numpy", "pandas", "PIL", "torch", "torchvision", "tqdm")
+
+
+def _loaded_modules(statement: str):
+    code = f"import sys; {statement}; print(' '.join(sys.modules))"
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=PACKAGE_ROOT, text=True)
+    return set(output.split())
+
+
+@pytest.mark.parametrize("statement", [
+    "import pyedpiper",
+    "from pyedpiper import instantiate, compile",
+    "from pyedpiper.misc import get_random_name",
+])
+def test_import_is_lazy(statement):
+    loaded = _loaded_modules(statement)
+    assert not loaded.intersection(HEAVY_MODULES)
+
+
+def test_lazy_attributes():
+    import pyedpiper
+    import pyedpiper.data
+    import pyedpiper.modules
+
+    assert pyedpiper.modules.FocalLoss is pyedpiper.modules.loss.FocalLoss
+    assert pyedpiper.data.ImageDataset is pyedpiper.data.datasets.ImageDataset
+    assert pyedpiper.common is pyedpiper.core.common
+    assert "instantiate" in dir(pyedpiper)
+
+    with pytest.raises(AttributeError):
+        pyedpiper.missing
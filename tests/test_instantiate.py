@@ -1,7 +1,19 @@
-from pyedpiper import instantiate
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+import torch
+
+from pyedpiper import LazyObject, compile, instantiate, parallel_instantiate
 from pyedpiper.core.common import (
+    _ID_KEY as ID_KEY,
+    _LAZY_KEY as LAZY_KEY,
     _MODULE_KEY as MODULE_KEY,
     _PARAMS_KEY as PARAMS_KEY,
+    _REF_KEY as REF_KEY,
+    _SHARED_KEY as SHARED_KEY,
     _TARGET_KEY as TARGET_KEY,
 )
 
@@ -60,3 +72,275 @@ def test_simple_object_with_defaults():
     assert isinstance(obj_3, SimpleWithDefaults)
     assert obj_3.a == 20
     assert obj_3.b == 'another'
+
+
+class Nested:
+
+    def __init__(self, inner: Simple, c: int = 0):
+        self.inner = inner
+        self.c = c
+
+
+def test_compiled_config():
+    cfg = build_config(Nested, {'inner': build_config(Simple, {'a': 1, 'b': 'test'})})
+    compiled = compile(cfg)
+
+    obj_1 = compiled.build()
+    obj_2 = compiled.build(c=5)
+
+    assert isinstance(obj_1, Nested)
+    assert isinstance(obj_1.inner, Simple)
+    assert obj_1.inner.a == 1
+    assert obj_1.c == 0
+    assert obj_2.c == 5
+
+    # Every build produces fresh objects
+    assert obj_1.inner is not obj_2.inner
+
+
+def test_compiled_config_overrides():
+    cfg = build_config(Nested, {'inner': build_config(Simple, {'a': 1, 'b': 'test'})})
+    compiled = compile(cfg)
+
+    obj = compiled.build(inner=build_config(Simple, {'a': 2, 'b': 'another'}))
+    assert obj.inner.a == 2
+    assert obj.inner.b == 'another'
+
+    obj = compiled.build(inner='raw', unknown=True)
+    assert obj.inner == 'raw'
+
+
+def test_compiled_config_missing_parameters():
+    compiled = compile(build_config(Simple, {'a': 1}))
+
+    assert compiled.build(b='test').b == 'test'
+
+    with pytest.raises(Exception, match="Not enough parameters"):
+        compiled.build()
+
+
+def activation(input, inplace=False):
+    return input
+
+
+def test_compiled_config_function_nodes():
+    # Functions are passed as they are, their required and given params alike
+    cfg = build_config(Pair, {'left': build_config(activation, {}), 'right': build_config(activation, {'x': 1})})
+    compiled = compile(cfg)
+
+    obj = compiled.build()
+    assert obj.left is obj.right is activation
+    assert compile(build_config(activation, {})).build() is activation
+
+
+def test_instantiate_function_valued_params():
+    relu = {TARGET_KEY: 'relu', MODULE_KEY: 'torch.nn.functional'}
+
+    obj = instantiate(build_config(Pair, {'left': relu, 'right': dict(relu, **{PARAMS_KEY: {'inplace': True}})}))
+    assert obj.left is obj.right is torch.nn.functional.relu
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        obj = parallel_instantiate(build_config(Pair, {'left': relu, 'right': None}), executor)
+    assert obj.left is torch.nn.functional.relu
+
+
+_barrier = threading.Barrier(2, timeout=5)
+
+
+class Rendezvous:
+
+    def __init__(self, name: str):
+        # Can only pass if the sibling is built at the same time
+        _barrier.wait()
+        self.name = name
+
+
+class Failing:
+
+    def __init__(self, message: str):
+        raise RuntimeError(message)
+
+
+def test_parallel_instantiate():
+    cfg = build_config(Nested, {
+        'inner': build_config(Simple, {
+            'a': build_config(Rendezvous, {'name': 'left'}),
+            'b': build_config(Rendezvous, {'name': 'right'}),
+        }),
+    })
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        obj = parallel_instantiate(cfg, executor, c=1)
+
+    assert isinstance(obj, Nested)
+    assert obj.c == 1
+    assert obj.inner.a.name == 'left'
+    assert obj.inner.b.name == 'right'
+
+
+def test_parallel_instantiate_reports_first_error():
+    cfg = build_config(Simple, {
+        'a': build_config(Failing, {'message': 'first'}),
+        'b': build_config(Failing, {'message': 'second'}),
+    })
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for _ in range(5):
+            with pytest.raises(RuntimeError, match='first'):
+                parallel_instantiate(cfg, executor)
+
+
+class Pair:
+
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+
+
+def test_instantiate_references():
+    encoder = dict(build_config(SimpleWithDefaults, {'a': 1}), **{ID_KEY: 'encoder'})
+
+    # Reference may come before the node it points to
+    cfg = build_config(Pair, {'left': {REF_KEY: 'encoder'}, 'right': encoder})
+    obj = instantiate(cfg)
+
+    assert isinstance(obj.left, SimpleWithDefaults)
+    assert obj.left is obj.right
+
+    # Only the referenced instance gets overridden
+    obj = compile(cfg).build(right=build_config(SimpleWithDefaults, {'a': 2}))
+    assert obj.left.a == 1
+    assert obj.right.a == 2
+
+
+def test_instantiate_shared_nodes():
+    shared = dict(build_config(SimpleWithDefaults, {'a': 1}), **{SHARED_KEY: True})
+    plain = build_config(SimpleWithDefaults, {'a': 1})
+
+    obj = instantiate(build_config(Pair, {'left': shared, 'right': dict(shared)}))
+    assert obj.left is obj.right
+
+    obj = instantiate(build_config(Pair, {'left': plain, 'right': dict(plain)}))
+    assert obj.left is not obj.right
+
+
+def test_instantiate_shared_nodes_compare_types_and_objects():
+    def shared(a):
+        return dict(build_config(SimpleWithDefaults, {'a': a}), **{SHARED_KEY: True})
+
+    # Equal but distinct values aren't merged
+    obj = instantiate(build_config(Pair, {'left': shared(True), 'right': shared(1)}))
+    assert obj.left is not obj.right
+    assert obj.left.a is True
+
+    obj = instantiate(build_config(Pair, {'left': shared(np.zeros(2)), 'right': shared(np.ones(2))}))
+    assert obj.left is not obj.right
+    assert obj.right.a.tolist() == [1, 1]
+
+    array = np.zeros(2)
+    obj = instantiate(build_config(Pair, {'left': shared(array), 'right': shared(array)}))
+    assert obj.left is obj.right
+
+
+class Tagged:
+
+    def __init__(self, id, shared, lazy):
+        self.id = id
+        self.shared = shared
+        self.lazy = lazy
+
+
+def test_instantiate_passes_plain_service_names():
+    # Only the namespaced keys are meaningful to the builder
+    obj = instantiate(build_config(Pair, {'left': {'ref': 'encoder'}, 'right': None}))
+    assert obj.left == {'ref': 'encoder'}
+
+    obj = instantiate(build_config(Tagged, {'id': 'node', 'shared': True, 'lazy': True}))
+    assert (obj.id, obj.shared, obj.lazy) == ('node', True, True)
+
+
+def test_instantiate_invalid_references():
+    with pytest.raises(ValueError, match="reference"):
+        instantiate(build_config(Pair, {'left': {REF_KEY: 'missing'}, 'right': None}))
+
+    looped = dict(build_config(Pair, {'left': {REF_KEY: 'looped'}, 'right': None}), **{ID_KEY: 'looped'})
+    with pytest.raises(ValueError, match="itself"):
+        instantiate(build_config(Pair, {'left': looped, 'right': None}))
+
+
+class Counted:
+    built = 0
+
+    def __init__(self, a: int):
+        Counted.built += 1
+        self.a = a
+
+    def __call__(self, x):
+        return self.a + x
+
+
+def test_instantiate_lazy_nodes():
+    Counted.built = 0
+
+    cfg = build_config(Pair, {
+        'left': dict(build_config(Counted, {'a': 1}), **{LAZY_KEY: True}),
+        'right': build_config(Counted, {'a': 2}),
+    })
+    obj = instantiate(cfg)
+
+    assert isinstance(obj.left, LazyObject)
+    assert Counted.built == 1
+
+    assert obj.left.a == 1
+    assert obj.left(2) == 3
+    assert Counted.built == 2
+    assert isinstance(obj.left.__wrapped__, Counted)
+
+
+def test_instantiate_lazy_node_shares_outer_ids():
+    Counted.built = 0
+
+    counted = dict(build_config(Counted, {'a': 1}), **{ID_KEY: 'counted'})
+    lazy = dict(build_config(Pair, {'left': {REF_KEY: 'counted'}, 'right': None}), **{LAZY_KEY: True})
+
+    # The lazy node may come before or after the node with the id, or define it itself
+    for left, right in [(lazy, counted), (counted, lazy)]:
+        obj = instantiate(build_config(Pair, {'left': left, 'right': right}))
+        inner, outer = (obj.left, obj.right) if left is lazy else (obj.right, obj.left)
+        assert inner.left is outer
+
+    inner = dict(build_config(Pair, {'left': counted, 'right': None}), **{LAZY_KEY: True})
+    obj = instantiate(build_config(Pair, {'left': inner, 'right': {REF_KEY: 'counted'}}))
+    assert obj.left.left is obj.right
+
+    # Ids used only within the lazy node are still built lazily
+    Counted.built = 0
+    inner = dict(build_config(Pair, {'left': counted, 'right': {REF_KEY: 'counted'}}), **{LAZY_KEY: True})
+    obj = instantiate(build_config(Pair, {'left': inner, 'right': None}))
+    assert Counted.built == 0
+    assert obj.left.left is obj.left.right
+    assert Counted.built == 1
+
+
+def test_parallel_instantiate_lazy_node_shares_outer_ids():
+    counted = dict(build_config(Counted, {'a': 1}), **{ID_KEY: 'counted'})
+    lazy = dict(build_config(Pair, {'left': {REF_KEY: 'counted'}, 'right': None}), **{LAZY_KEY: True})
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        obj = parallel_instantiate(build_config(Pair, {'left': lazy, 'right': counted}), executor)
+    assert obj.left.left is obj.right
+
+
+def test_instantiate_lazy_root():
+    Counted.built = 0
+
+    obj = instantiate(dict(build_config(Counted, {'a': 1}), **{LAZY_KEY: True}), a=5)
+    assert Counted.built == 0
+    assert obj(1) == 6
+    assert Counted.built == 1
+
+
+def test_instantiate_lazy_node_checks_parameters():
+    cfg = build_config(Pair, {'left': dict(build_config(Counted, {}), **{LAZY_KEY: True}), 'right': None})
+    with pytest.raises(Exception, match="Not enough parameters"):
+        instantiate(cfg)
@@ -0,0 +1,307 @@
+import math
+
+import pytest
+import torch
+
+from pyedpiper.modules.loss import (
+    BinaryFocalLoss,
+    CauchyLoss,
+    ChunkedSmoothCrossEntropyLoss,
+    CompositeLoss,
+    FocalLoss,
+    OHEMNLLLoss,
+    SmoothCrossEntropyLoss,
+    WingLoss,
+    focal_loss_with_logits,
+    label_smoothed_nll_loss,
+    masked_reduce,
+)
+
+
+def _focal_loss_per_class(input, target, ignore_index=None, **kwargs):
+    """Reference implementation that loops over the classes."""
+
+    loss = 0
+    not_ignored = target != ignore_index
+
+    for cls in range(input.size(1)):
+        cls_target = (target == cls).long()
+        cls_input = input[:, cls, ...]
+
+        if ignore_index is not None:
+            cls_target = cls_target[not_ignored]
+            cls_input = cls_input[not_ignored]
+
+        loss += focal_loss_with_logits(cls_input, cls_target, **kwargs)
+
+    return loss
+
+
+@pytest.mark.parametrize("shape", [(16, 5), (4, 3, 6, 7)])
+@pytest.mark.parametrize("options", [
+    dict(),
+    dict(alpha=0.25, reduction="sum"),
+    dict(normalized=True),
+    dict(reduced_threshold=0.5),
+    dict(ignore_index=-1),
+    dict(ignore_index=-1, reduction="sum", normalized=True, alpha=0.5),
+])
+def test_focal_loss_matches_per_class_loop(shape, options):
+    torch.manual_seed(0)
+
+    input = torch.randn(*shape, dtype=torch.float64)
+    target = torch.randint(-1, shape[1], (shape[0],) + shape[2:])
+
+    expected_options = dict(options)
+    expected_options.setdefault("alpha", None)
+
+    expected = _focal_loss_per_class(input, target, **expected_options)
+    actual = FocalLoss(**options)(input, target)
+
+    assert torch.allclose(actual, expected)
+
+
+def _ohem_loop(input, target, ratio):
+    """Reference implementation with a loop over the instances."""
+
+    input = torch.log_softmax(input, dim=1)
+    inst_losses = torch.stack([-input[idx, label] for idx, label in enumerate(target)])
+    _, idxs = inst_losses.topk(int(ratio * input.size(0)))
+    return torch.nn.functional.nll_loss(input[idxs], target[idxs])
+
+
+def test_ohem_matches_loop():
+    torch.manual_seed(0)
+
+    input = torch.randn(32, 5, dtype=torch.float64)
+    target = torch.randint(0, 5, (32,))
+
+    assert torch.allclose(OHEMNLLLoss(0.25)(input, target), _ohem_loop(input, target, 0.25))
+
+
+def test_ohem_dense_and_ignored():
+    torch.manual_seed(0)
+
+    input = torch.randn(2, 3, 4, 4, dtype=torch.float64)
+    target = torch.randint(0, 3, (2, 4, 4))
+    target[0] = -100
+
+    flat_input = input.permute(0, 2, 3, 1).reshape(-1, 3)[16:]
+    flat_target = target.reshape(-1)[16:]
+
+    expected = torch.nn.functional.cross_entropy(flat_input, flat_target)
+    assert torch.allclose(OHEMNLLLoss(1.0)(input, target), expected)
+
+    # Ratio counts the valid pixels only
+    assert torch.allclose(OHEMNLLLoss(0.5)(input, target), _ohem_loop(flat_input, flat_target, 0.5))
+
+
+def test_ohem_tensor_ratio():
+    torch.manual_seed(0)
+
+    input = torch.randn(32, 5, dtype=torch.float64)
+    target = torch.randint(0, 5, (32,))
+
+    assert torch.allclose(OHEMNLLLoss(torch.tensor(0.25))(input, target), _ohem_loop(input, target, 0.25))
+
+
+def test_ohem_per_class_ratios():
+    input = torch.log(torch.tensor([
+        [0.9, 0.1],
+        [0.6, 0.4],
+        [0.2, 0.8],
+        [0.4, 0.6],
+    ], dtype=torch.float64))
+    target = torch.tensor([0, 0, 1, 1])
+
+    # The hardest of class 0 and both of class 1
+    loss = OHEMNLLLoss([0.5, 1.0])(input, target)
+    expected = -(torch.log(torch.tensor(0.6)) + torch.log(torch.tensor(0.8)) + torch.log(torch.tensor(0.6))) / 3
+    assert torch.allclose(loss.float(), expected)
+
+
+def _wing_loss_masked(input, target, width, curvature):
+    """Reference implementation with boolean mask assignments."""
+
+    diff_abs = (target - input).abs()
+    loss = diff_abs.clone()
+
+    idx_smaller = diff_abs < width
+    idx_bigger = diff_abs >= width
+
+    loss[idx_smaller] = width * torch.log(1 + diff_abs[idx_smaller] / curvature)
+    loss[idx_bigger] = loss[idx_bigger] - (width - width * math.log(1 + width / curvature))
+    return loss.mean()
+
+
+@pytest.mark.parametrize("scripted", [False, True])
+def test_wing_loss_matches_masked(scripted):
+    torch.manual_seed(0)
+
+    input = torch.randn(64, 2, dtype=torch.float64, requires_grad=True) * 10
+    target = torch.randn(64, 2, dtype=torch.float64)
+
+    expected = _wing_loss_masked(input, target, 5, 0.5)
+    actual = WingLoss(5, 0.5, scripted=scripted)(input, target)
+    assert torch.allclose(actual, expected)
+
+    expected_grad, = torch.autograd.grad(expected, input)
+    actual_grad, = torch.autograd.grad(actual, input)
+    assert torch.allclose(actual_grad, expected_grad)
+
+
+def _focal_loss_composite(input, target, gamma=2.0, alpha=0.25, reduction="mean", normalized=False,
+                          reduced_threshold=None):
+    """Reference implementation built of separate autograd ops."""
+
+    target = target.type_as(input)
+    logpt = torch.nn.functional.binary_cross_entropy_with_logits(input, target, reduction="none")
+    pt = torch.exp(-logpt)
+
+    if reduced_threshold is None:
+        focal_term = (1 - pt).pow(gamma)
+    else:
+        focal_term = ((1.0 - pt) / reduced_threshold).pow(gamma)
+        focal_term = torch.where(pt < reduced_threshold, torch.ones_like(focal_term), focal_term)
+
+    loss = focal_term * logpt
+
+    if alpha is not None:
+        loss = loss * (alpha * target + (1 - alpha) * (1 - target))
+
+    if normalized:
+        loss = loss / (focal_term.sum() + 1e-5)
+
+    return loss.mean() if reduction == "mean" else loss.sum()
+
+
+@pytest.mark.parametrize("options", [
+    dict(),
+    dict(alpha=None, gamma=0),
+    dict(gamma=1.5, reduction="sum"),
+    dict(normalized=True),
+    dict(reduced_threshold=0.5, alpha=None),
+    dict(reduced_threshold=0.3, normalized=True),
+])
+def test_fused_focal_loss_matches_composite(options):
+    torch.manual_seed(0)
+
+    input = (torch.randn(8, 16, dtype=torch.float64) * 3).requires_grad_()
+    target = torch.randint(0, 2, (8, 16))
+
+    expected = _focal_loss_composite(input, target, **options)
+    actual = focal_loss_with_logits(input, target, **options)
+    assert torch.allclose(actual, expected)
+
+    expected_grad, = torch.autograd.grad(expected, input)
+    actual_grad, = torch.autograd.grad(actual, input)
+    assert torch.allclose(actual_grad, expected_grad)
+
+    assert torch.autograd.gradcheck(lambda x: focal_loss_with_logits(x, target, **options), (input,))
+
+
+@pytest.mark.parametrize("options", [
+    dict(),
+    dict(gamma=0.0, alpha=None, reduction="sum"),
+    dict(reduced_threshold=0.5, normalized=True),
+])
+def test_focal_loss_soft_target_grad(options):
+    torch.manual_seed(0)
+
+    input = (torch.randn(8, 16, dtype=torch.float64) * 3).requires_grad_()
+    target = torch.rand(8, 16, dtype=torch.float64).requires_grad_()
+
+    expected = _focal_loss_composite(input, target, **options)
+    actual = focal_loss_with_logits(input, target, **options)
+
+    expected_grads = torch.autograd.grad(expected, (input, target))
+    actual_grads = torch.autograd.grad(actual, (input, target))
+    assert all(torch.allclose(a, e) for a, e in zip(actual_grads, expected_grads))
+
+    assert torch.autograd.gradcheck(lambda x, t: focal_loss_with_logits(x, t, **options), (input, target))
+
+
+def test_masked_reduce():
+    loss = torch.tensor([[1., 2.], [3., float('inf')]])
+    mask = torch.tensor([[True, True], [True, False]])
+
+    assert masked_reduce(loss, mask, "mean") == 2.
+    assert masked_reduce(loss, mask, "sum") == 6.
+    assert torch.equal(masked_reduce(loss, mask, "none"), torch.tensor([[1., 2.], [3., 0.]]))
+    assert masked_reduce(loss, torch.zeros_like(mask), "mean") == 0.
+
+
+@pytest.mark.parametrize("reduction", ["mean", "sum"])
+def test_ignore_index_matches_filtering(reduction):
+    torch.manual_seed(0)
+
+    input = torch.randn(32, dtype=torch.float64)
+    target = torch.randint(-1, 2, (32,))
+    valid = target != -1
+
+    expected = focal_loss_with_logits(input[valid], target[valid], reduction=reduction, normalized=True)
+    actual = BinaryFocalLoss(alpha=0.25, ignore_index=-1, reduction=reduction, normalized=True)(input, target)
+    assert torch.allclose(actual, expected)
+
+    expected = CauchyLoss(reduction=reduction)(input[valid], target[valid])
+    actual = CauchyLoss(reduction=reduction, ignore_index=-1)(input, target)
+    assert torch.allclose(actual, expected)
+
+    lprobs = torch.log_softmax(torch.randn(32, 3, dtype=torch.float64), dim=-1)
+    expected = label_smoothed_nll_loss(lprobs[valid], target[valid], 0.1, reduction=reduction)
+    actual = label_smoothed_nll_loss(lprobs, target, 0.1, ignore_index=-1, reduction=reduction)
+    assert torch.allclose(actual, expected)
+
+
+def test_composite_loss(monkeypatch):
+    import pyedpiper.modules.loss.composite as composite
+
+    torch.manual_seed(0)
+
+    input = torch.randn(16, 4, dtype=torch.float64)
+    target = torch.randint(0, 4, (16,))
+
+    losses = {
+        "ce": SmoothCrossEntropyLoss(smooth_factor=0.1),
+        "focal": FocalLoss(),
+        "ohem": OHEMNLLLoss(0.5),
+        "plain": torch.nn.CrossEntropyLoss(),
+    }
+    weights = {"ce": 1.0, "focal": 0.5, "ohem": 2.0}
+
+    calls = list()
+    log_softmax = composite.F.log_softmax
+    monkeypatch.setattr(composite.F, "log_softmax", lambda *args, **kwargs: calls.append(1) or log_softmax(*args, **kwargs))
+
+    total, terms = CompositeLoss(losses, weights)(input, target)
+    monkeypatch.undo()
+
+    # Shared by the smooth cross entropy and OHEM
+    assert len(calls) == 1
+
+    for name, loss in losses.items():
+        assert torch.allclose(terms[name], loss(input, target))
+
+    assert torch.allclose(total, sum(weights.get(name, 1.0) * terms[name] for name in losses))
+
+
+@pytest.mark.parametrize("reduction", ["mean", "sum", "none"])
+def test_chunked_smooth_cross_entropy(reduction):
+    torch.manual_seed(0)
+
+    hidden = torch.randn(4, 5, 8, dtype=torch.float64, requires_grad=True)
+    weight = torch.randn(11, 8, dtype=torch.float64, requires_grad=True)
+    bias = torch.randn(11, dtype=torch.float64, requires_grad=True)
+    target = torch.randint(-1, 11, (4, 5))
+
+    full = SmoothCrossEntropyLoss(reduction, smooth_factor=0.1, ignore_index=-1, dim=-1)
+    chunked = ChunkedSmoothCrossEntropyLoss(reduction, smooth_factor=0.1, ignore_index=-1, chunk_size=3)
+
+    expected = full(torch.nn.functional.linear(hidden, weight, bias), target)
+    actual = chunked(hidden, weight, target, bias)
+    assert torch.allclose(actual, expected)
+
+    expected_grads = torch.autograd.grad(expected.sum(), (hidden, weight, bias))
+    actual_grads = torch.autograd.grad(actual.sum(), (hidden, weight, bias))
+    for actual_grad, expected_grad in zip(actual_grads, expected_grads):
+        assert torch.allclose(actual_grad, expected_grad)
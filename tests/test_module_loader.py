@@ -0,0 +1,58 @@
+import os
+
+from pyedpiper.core.module_loader import ModuleLoader
+
+
+def _write_module(path, value):
+    path.write_text(f"VALUE = {value!r}\n")
+
+
+def test_local_module_is_executed_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ModuleLoader.clear_cache()
+
+    _write_module(tmp_path / 'local.py', 1)
+
+    module = ModuleLoader.load_module('local.py')
+    assert module.VALUE == 1
+    assert ModuleLoader.load_module('local.py') is module
+    assert ModuleLoader.load_module(str(tmp_path / 'local.py')).VALUE == 1
+
+
+def test_local_module_is_reloaded_on_change(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ModuleLoader.clear_cache()
+
+    path = tmp_path / 'local.py'
+    _write_module(path, 1)
+    module = ModuleLoader.load_module('local')
+
+    _write_module(path, 'changed')
+    # Make sure the change is visible even on filesystems with coarse timestamps
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    reloaded = ModuleLoader.load_module('local')
+    assert reloaded is not module
+    assert reloaded.VALUE == 'changed'
+
+
+def test_external_module_is_cached():
+    ModuleLoader.clear_cache()
+
+    module = ModuleLoader.load_module('collections.abc')
+    assert module.__name__ == 'collections.abc'
+    assert ModuleLoader.load_module('collections.abc') is module
+
+
+def test_local_module_loading_another_one(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ModuleLoader.clear_cache()
+
+    _write_module(tmp_path / 'inner.py', 'inner')
+    (tmp_path / 'outer.py').write_text(
+        "from pyedpiper.core.module_loader import ModuleLoader\n"
+        "VALUE = ModuleLoader.load_module('inner.py').VALUE\n"
+    )
+
+    assert ModuleLoader.load_module('outer.py').VALUE == 'inner'
@@ -0,0 +1,58 @@
+import gc
+
+import pytest
+
+from pyedpiper.core.object_caller import ObjectCaller
+
+
+class Simple:
+
+    def __init__(self, a: int, b: str = 'test', **kwargs):
+        self.a = a
+        self.b = b
+
+
+def function(x, y=2):
+    return x + y
+
+
+def test_call_drops_unknown_parameters():
+    obj = ObjectCaller.call_from_kwargs(Simple, a=1, c=3)
+    assert obj.a == 1
+    assert obj.b == 'test'
+
+    assert ObjectCaller.call_from_kwargs(function, 1, z=10) == 3
+
+
+def test_call_fails_on_missing_parameters():
+    with pytest.raises(Exception, match="Not enough parameters"):
+        ObjectCaller.call_from_kwargs(Simple, b='another')
+
+
+def test_call_plan_is_cached():
+    ObjectCaller.cache_clear()
+
+    for a in range(5):
+        obj = ObjectCaller.call_from_kwargs(Simple, a=a)
+        assert obj.a == a
+
+    info = ObjectCaller.cache_info()
+    assert info.misses == 1
+    assert info.hits == 4
+    assert info.currsize == 1
+
+
+def test_call_plan_cache_is_weak():
+    ObjectCaller.cache_clear()
+
+    class Local:
+        def __init__(self, a):
+            self.a = a
+
+    assert ObjectCaller.call_from_kwargs(Local, a=1).a == 1
+    assert ObjectCaller.cache_info().currsize == 1
+
+    del Local
+    gc.collect()
+
+    assert ObjectCaller.cache_info().currsize == 0
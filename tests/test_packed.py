@@ -0,0 +1,81 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyedpiper.data.datasets import ImageDataset
+from pyedpiper.data.packed import PackedDataset, pack_dataset
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    root = tmp_path / 'images'
+    root.mkdir()
+
+    images = {
+        'a': np.arange(12, dtype=np.uint8).reshape(3, 4),
+        'b': np.arange(24, dtype=np.uint8).reshape(2, 4, 3),
+        'c': np.linspace(0, 1, 5, dtype=np.float32),
+    }
+    for name, image in images.items():
+        np.save(root / f'{name}.npy', image)
+
+    labels = pd.DataFrame({'id': list(images), 'label': [3, 1, 2]})
+    return ImageDataset(root, labels, 'label', 'id', extensions=('npy',), loader=np.load)
+
+
+@pytest.mark.parametrize('shard_bytes', [2 ** 20, 1])
+def test_packed_dataset_matches_source(dataset, tmp_path, shard_bytes):
+    pack_dataset(dataset, tmp_path / 'packed' / 'train', shard_bytes=shard_bytes)
+    packed = PackedDataset(tmp_path / 'packed' / 'train')
+
+    assert len(packed) == len(dataset)
+    np.testing.assert_array_equal(packed.targets, dataset.targets)
+
+    for idx in range(len(dataset)):
+        expected, target = dataset[idx]
+        sample, packed_target = packed[idx]
+
+        assert sample.dtype == expected.dtype
+        np.testing.assert_array_equal(sample, expected)
+        assert packed_target == target
+
+    shards = sorted(path.name for path in (tmp_path / 'packed').glob('*.bin'))
+    assert len(shards) == (1 if shard_bytes > 1 else 3)
+
+
+def test_packed_dataset_views_and_copies(dataset, tmp_path):
+    pack_dataset(dataset, tmp_path / 'train')
+
+    assert not PackedDataset(tmp_path / 'train')[0][0].flags.writeable
+    assert PackedDataset(tmp_path / 'train', copy=True)[0][0].flags.writeable
+
+
+def test_packed_dataset_pickles(dataset, tmp_path):
+    pack_dataset(dataset, tmp_path / 'train')
+    packed = PackedDataset(tmp_path / 'train', transform=np.sum)
+    expected = packed[1]
+
+    restored = pickle.loads(pickle.dumps(packed))
+    assert restored[1] == expected
+
+
+def test_packed_dataset_string_labels(dataset, tmp_path):
+    dataset.targets = np.array(['cat', 'dog', 'bird'], dtype=object)
+    pack_dataset(dataset, tmp_path / 'train')
+
+    packed = PackedDataset(tmp_path / 'train')
+    assert packed.targets.tolist() == ['cat', 'dog', 'bird']
+    assert packed[2][1] == 'bird'
+
+
+def test_pack_dataset_rejects_unpackable(dataset, tmp_path):
+    dataset.targets = np.array([1, None, 'a'], dtype=object)
+    with pytest.raises(ValueError, match="mixed"):
+        pack_dataset(dataset, tmp_path / 'train')
+
+    dataset.samples = []
+    with pytest.raises(ValueError, match="empty"):
+        pack_dataset(dataset, tmp_path / 'train')
+    assert not list(tmp_path.glob('train*'))
@@ -0,0 +1,174 @@
+import io
+import pickle
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyedpiper.data.datasets import ImageDataset
+from pyedpiper.data.storage import ObjectStorage
+
+_PAGE_SIZE = 2
+
+
+class ObjectStoreHandler(BaseHTTPRequestHandler):
+    """Minimal S3-style bucket: paginated ListObjectsV2 and GetObject."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        bucket, _, key = unquote(url.path).lstrip('/').partition('/')
+        if bucket != 'bucket':
+            return self._send(404, b'NoSuchBucket')
+
+        if not key:
+            return self._list(parse_qs(url.query))
+
+        with self.server.lock:
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+            self.server.requests.append(key)
+
+        time.sleep(self.server.latency)
+
+        with self.server.lock:
+            self.server.active -= 1
+
+        if key in self.server.statuses:
+            return self._send(self.server.statuses[key], self.server.objects.get(key, b''))
+
+        if key not in self.server.objects:
+            return self._send(404, b'NoSuchKey')
+        self._send(200, self.server.objects[key])
+
+    def _list(self, query):
+        prefix = query.get('prefix', [''])[0]
+        delimiter = query.get('delimiter', [None])[0]
+        start = int(query.get('continuation-token', ['0'])[0])
+
+        keys = sorted(key for key in self.server.objects
+                      if key.startswith(prefix) and not (delimiter and delimiter in key[len(prefix):]))
+        page = keys[start:start + _PAGE_SIZE]
+        truncated = start + _PAGE_SIZE < len(keys)
+
+        contents = ''.join(f"<Contents><Key>{escape(key)}</Key></Contents>" for key in page)
+        token = f"<NextContinuationToken>{start + _PAGE_SIZE}</NextContinuationToken>" if truncated else ''
+        body = ('<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+                f"<IsTruncated>{str(truncated).lower()}</IsTruncated>{contents}{token}</ListBucketResult>")
+        self._send(200, body.encode())
+
+
+def _npy(value):
+    buffer = io.BytesIO()
+    np.save(buffer, np.full((2, 2), value, dtype=np.uint8))
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ObjectStoreHandler)
+    server.daemon_threads = True
+    server.objects = {f'images/{idx}.npy': _npy(idx) for idx in range(8)}
+    server.objects.update({'images/notes.txt': b'', 'images/nested/8.npy': _npy(8)})
+    server.lock = threading.Lock()
+    server.connections = server.active = server.max_active = 0
+    server.requests = []
+    server.statuses = {}
+    server.latency = 0.0
+
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def storage(server, tmp_path):
+    return ObjectStorage(f'http://127.0.0.1:{server.server_port}', 'bucket', cache_dir=tmp_path / 'cache',
+                         max_concurrency=4)
+
+
+def test_list_paginates(storage):
+    assert storage.list('images', ('npy',)) == [f'images/{idx}.npy' for idx in range(8)]
+    assert storage.list('images/', ('.npy',), recursive=True)[-1] == 'images/nested/8.npy'
+
+
+def test_fetch_many_is_concurrent_and_pooled(server, storage):
+    server.latency = 0.05
+    keys = [f'images/{idx}.npy' for idx in range(8)]
+
+    paths = storage.fetch_many(keys + keys[:2])
+    assert [np.load(path)[0, 0] for path in paths] == list(range(8)) + [0, 1]
+
+    # Bounded concurrency over reused connections, every object is downloaded once
+    assert 1 < server.max_active <= 4
+    assert server.connections <= 4
+    assert sorted(server.requests) == sorted(keys)
+
+    # Read-through cache serves repeated reads locally
+    assert storage.fetch('images/3.npy') == paths[3]
+    assert len(server.requests) == len(keys)
+
+
+def test_fetch_missing_raises(storage):
+    with pytest.raises(OSError, match="status 404"):
+        storage.fetch('images/missing.npy')
+
+
+@pytest.mark.parametrize('status', [204, 206, 304])
+def test_fetch_requires_complete_object(server, storage, status):
+    server.statuses['images/1.npy'] = status
+
+    with pytest.raises(OSError, match=f"status {status}"):
+        storage.fetch('images/1.npy')
+    assert not list(storage.cache_dir.rglob('*.npy'))
+
+
+@pytest.mark.parametrize('key', ['../outside.npy', 'images/../../outside.npy', '..', '/'])
+def test_fetch_rejects_keys_outside_cache(storage, key):
+    with pytest.raises(ValueError, match="outside"):
+        storage.fetch(key)
+
+    with pytest.raises(ValueError, match="outside"):
+        storage.fetch_many([key])
+
+
+def test_storage_pickles(storage):
+    storage.fetch('images/1.npy')
+
+    restored = pickle.loads(pickle.dumps(storage))
+    assert np.load(restored.fetch('images/2.npy'))[0, 0] == 2
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_image_dataset_reads_storage(server, storage, compact):
+    labels = pd.DataFrame({'id': [str(idx) for idx in range(8)], 'label': list(range(8))})
+    dataset = ImageDataset('images', labels, 'label', 'id', extensions=('npy',), loader=np.load,
+                           storage=storage, compact=compact)
+
+    assert len(dataset) == 8
+    image, target = dataset[5]
+    assert image[0, 0] == target == 5
+
+    images, targets = dataset.get_batch([0, 1, 2, 3])
+    assert images[:, 0, 0].tolist() == targets.tolist() == [0, 1, 2, 3]